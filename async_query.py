@@ -0,0 +1,139 @@
+from shortest_path import Dijkstra, SearchCancelled
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import math
+import threading
+
+
+class AsyncShortestPathService():
+    '''Answers shortest path queries from asyncio code without blocking the event loop.
+    Searches run in an executor, concurrent queries for the same (start, end) share one search,
+    and at most max_pending searches run or wait for a worker at a time, so callers queue up
+    on the event loop instead of piling work onto the executor.'''
+
+    def __init__(self, graph, algorithm=Dijkstra, max_workers=None, max_pending=64, executor=None, **options):
+        '''Initialize the service. Extra options, such as landmarks for A_Star, are passed to the algorithm.
+        If no executor is given a thread pool with max_workers threads is created and owned by the service.
+        Only thread pools work, since searches are cancelled through a threading.Event that cannot be sent to another process.'''
+        assert executor is None or isinstance(executor, ThreadPoolExecutor), "The executor must be a ThreadPoolExecutor"
+        self.graph = graph
+        self.algorithm = algorithm
+        self._options = options
+        self._owns_executor = executor is None
+        self._executor = executor if executor is not None else ThreadPoolExecutor(max_workers=max_workers)
+        self._max_pending = max_pending
+        # Created lazily so the service can be built outside of a running event loop
+        self._semaphore = None
+        # [task, cancel event, number of waiting callers] of every search in flight by (start, end)
+        self._inflight = {}
+        self.searches = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.timeouts = 0
+
+    @property
+    def stats(self):
+        '''Returns the query counters'''
+        return {
+            'searches': self.searches,
+            'coalesced': self.coalesced,
+            'cancelled': self.cancelled,
+            'timeouts': self.timeouts,
+            'in_flight': len(self._inflight),
+        }
+
+    async def query(self, start_node, end_node, timeout=None):
+        '''Returns the shortest path and distance between two nodes. The path is None if the end node cannot be reached.
+        Raises asyncio.TimeoutError if the result is not ready within timeout seconds. The search itself is only
+        cancelled once every caller waiting for it has timed out or been cancelled.'''
+        assert start_node in self.graph and end_node in self.graph, "Start and end nodes must be nodes in the Graph"
+        key = (start_node, end_node)
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            cancel = threading.Event()
+            task = asyncio.ensure_future(self._run(start_node, end_node, cancel))
+            inflight = [task, cancel, 0]
+            self._inflight[key] = inflight
+            # Forget the search once it ends, and retrieve its exception so an abandoned search is not reported
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+
+        inflight[2] += 1
+        try:
+            # Shielded so that one caller giving up does not cancel the search for the others
+            path, distance = await asyncio.wait_for(asyncio.shield(inflight[0]), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            inflight[2] -= 1
+            if inflight[2] == 0 and not inflight[0].done():
+                # Nobody is waiting for the result any more, so stop the search at its next step.
+                # It is forgotten right away so a later query starts a new search instead of joining this one.
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+                inflight[1].set()
+                inflight[0].cancel()
+                self.cancelled += 1
+        return (list(path) if path is not None else None, distance)
+
+    async def shortest_path(self, start_node, end_node, timeout=None):
+        '''Returns the names of the nodes on the shortest path between two nodes'''
+        return (await self.query(start_node, end_node, timeout))[0]
+
+    async def shortest_distance(self, start_node, end_node, timeout=None):
+        '''Returns the shortest distance between two nodes'''
+        return (await self.query(start_node, end_node, timeout))[1]
+
+    async def _run(self, start_node, end_node, cancel):
+        '''Waits for a free slot and runs one search in the executor'''
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_pending)
+        async with self._semaphore:
+            if cancel.is_set():
+                raise SearchCancelled("Search was cancelled")
+            self.searches += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._search, start_node, end_node, cancel)
+
+    def _search(self, start_node, end_node, cancel):
+        '''Runs a search in a worker thread. The cancel event is checked before every step of the search.'''
+        search = self.algorithm(self.graph, start_node, end_node, cancel=cancel, **self._options)
+        distance = search.shortest_distance
+        return (search.shortest_path if distance != math.inf else None, distance)
+
+    def _finished(self, key, task):
+        '''Removes a finished search from the searches in flight'''
+        if self._inflight.get(key, [None])[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def _cancel_inflight(self):
+        '''Cancels every search in flight'''
+        for task, cancel, _ in list(self._inflight.values()):
+            cancel.set()
+            task.cancel()
+
+    def close(self):
+        '''Cancels the searches in flight and shuts down the executor if the service created it.
+        Running searches stop at their next step, but close does not wait for them so it never blocks the event loop.'''
+        self._cancel_inflight()
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def aclose(self):
+        '''Cancels the searches in flight and waits for the executor the service created to finish them.
+        The wait happens in another thread, so the event loop keeps running in the meantime.'''
+        self._cancel_inflight()
+        if self._owns_executor:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, partial(self._executor.shutdown, wait=True, cancel_futures=True))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -0,0 +1,107 @@
+from compact_graph import CompactGraph
+from graph_io import save_graph, load_graph
+from shortest_path import Dijkstra
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import math
+import os
+import shutil
+import tempfile
+
+# Memory-mapped graph opened once by every worker process
+_worker_graph = None
+
+def _open_worker_graph(path):
+    '''Maps the saved graph into the worker process. The pages are shared with every other worker.'''
+    global _worker_graph
+    _worker_graph = load_graph(path)
+
+def _use_worker_graph(graph):
+    '''Keeps a graph that was pickled into the worker process, for graphs save_graph cannot write'''
+    global _worker_graph
+    _worker_graph = graph
+
+def _can_save(graph):
+    '''Returns true if save_graph can write the graph, which needs node names that are all integers or all strings'''
+    names = graph.nodes
+    return all(isinstance(name, int) for name in names) or all(isinstance(name, str) for name in names)
+
+def _solve_source(source, queries):
+    '''Answers all the (index, end) queries that share a source with one search.
+    Returns (index, path, distance) triples, with a None path when the end cannot be reached.'''
+    results = []
+    if len(queries) == 1:
+        # A single target only needs a search that stops at the target
+        index, end = queries[0]
+        search = Dijkstra(_worker_graph, source, end)
+        distance = search.shortest_distance
+        results.append((index, search.shortest_path if distance != math.inf else None, distance))
+        return results
+
+    tree = Dijkstra(_worker_graph, source).shortest_path_tree()
+    for index, end in queries:
+        if tree.is_reachable(end):
+            results.append((index, tree.path_to(end), tree.distance_to(end)))
+        else:
+            results.append((index, None, math.inf))
+    return results
+
+
+def batch_shortest_paths(graph, pairs, max_workers=None, ordered=True):
+    '''Answers a batch of (start, end) queries and yields (start, end, path, distance) for each of them.
+    Queries are grouped by start node so each source is searched once, and the sources are spread over
+    a process pool. The graph is saved once and memory-mapped by the workers instead of being pickled
+    for every task; graph can also be the path of a graph already saved with save_graph.
+    Graphs whose node names are not all integers or all strings, such as (x, y) tuples, cannot be saved,
+    so they are pickled once into every worker instead.
+    Results are yielded in input order if ordered is true, or as soon as they are ready otherwise.'''
+    pairs = list(pairs)
+    # Group the queries by their start node, remembering their position in the input
+    sources = {}
+    for index, (start, end) in enumerate(pairs):
+        sources.setdefault(start, []).append((index, end))
+
+    directory = None
+    if isinstance(graph, (str, os.PathLike)):
+        initializer, initargs = _open_worker_graph, (graph,)
+    else:
+        if not isinstance(graph, CompactGraph):
+            graph = graph.freeze()
+        for start, end in pairs:
+            assert start in graph and end in graph, "Start and end nodes must be nodes in the Graph"
+        if _can_save(graph):
+            directory = tempfile.mkdtemp()
+            path = os.path.join(directory, 'graph.bin')
+            save_graph(graph, path)
+            initializer, initargs = _open_worker_graph, (path,)
+        else:
+            # Fall back to sending the graph through the pool initializer, as distance_matrix does
+            initializer, initargs = _use_worker_graph, (graph,)
+
+    try:
+        if max_workers == 1:
+            # Run the searches in this process when only one worker is requested
+            initializer(*initargs)
+            batches = (_solve_source(source, queries) for source, queries in sources.items())
+            yield from _stream(pairs, batches, ordered)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs) as executor:
+                futures = [executor.submit(_solve_source, source, queries) for source, queries in sources.items()]
+                yield from _stream(pairs, (future.result() for future in as_completed(futures)), ordered)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def _stream(pairs, batches, ordered):
+    '''Yields the results of each batch as it arrives, holding results back only as needed to keep input order'''
+    waiting = {}
+    next_index = 0
+    for batch in batches:
+        for index, path, distance in batch:
+            if not ordered:
+                yield (*pairs[index], path, distance)
+                continue
+            waiting[index] = (path, distance)
+            while next_index in waiting:
+                yield (*pairs[next_index], *waiting.pop(next_index))
+                next_index += 1
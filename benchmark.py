@@ -0,0 +1,287 @@
+from graph import Graph
+from shortest_path import Dijkstra, A_Star, BidirectionalDijkstra, BidirectionalA_Star
+from minimum_spanning_tree import prim, kruskal
+import argparse
+import json
+import math
+import platform
+import random
+import time
+import tracemalloc
+
+
+def grid_edges(size, seed=0):
+    '''Returns the edges and positions of a size x size grid with random weights of at least the edge length'''
+    rng = random.Random(seed)
+    positions = {}
+    edges = []
+    for x in range(size):
+        for y in range(size):
+            positions[x * size + y] = (x, y)
+            if x + 1 < size:
+                edges.append((x * size + y, (x + 1) * size + y, rng.randint(1, 4)))
+            if y + 1 < size:
+                edges.append((x * size + y, x * size + y + 1, rng.randint(1, 4)))
+    return edges, positions
+
+
+def random_geometric_edges(num_nodes, degree=6, seed=0):
+    '''Returns the edges and positions of random points in a square scaled to num_nodes,
+    connecting each point to its nearest neighbors with its rounded up distance as the weight'''
+    rng = random.Random(seed)
+    side = math.sqrt(num_nodes)
+    positions = {name: (rng.random() * side, rng.random() * side) for name in range(num_nodes)}
+
+    # Bucket the points into unit cells so neighbors are only looked for in nearby cells
+    cells = {}
+    for name, (x, y) in positions.items():
+        cells.setdefault((int(x), int(y)), []).append(name)
+    edges = []
+    for name, (x, y) in positions.items():
+        candidates = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other in cells.get((int(x) + dx, int(y) + dy), []):
+                    if other != name:
+                        candidates.append((math.dist(positions[name], positions[other]), other))
+        candidates.sort()
+        for distance, other in candidates[:degree]:
+            edges.append((name, other, math.ceil(distance * 100) / 100))
+    return edges, positions
+
+
+def scale_free_edges(num_nodes, links=3, seed=0):
+    '''Returns the edges of a Barabasi-Albert scale-free graph, where each new node links to existing
+    nodes with a probability proportional to their degree. The graph has no positions.'''
+    rng = random.Random(seed)
+    edges = []
+    # Every node appears in this list once per edge it has, so a uniform pick from it is degree-proportional
+    endpoints = list(range(links))
+    for node in range(links, num_nodes):
+        targets = set()
+        while len(targets) < links:
+            targets.add(rng.choice(endpoints))
+        for target in targets:
+            edges.append((node, target, rng.randint(1, 10)))
+            endpoints.extend((node, target))
+    return edges, None
+
+
+def dense_edges(num_nodes, density=0.5, seed=0):
+    '''Returns the edges of a random graph where every pair of nodes is connected with probability density.
+    The graph has no positions.'''
+    rng = random.Random(seed)
+    edges = []
+    for node1 in range(num_nodes):
+        for node2 in range(node1 + 1, num_nodes):
+            if rng.random() < density:
+                edges.append((node1, node2, rng.randint(1, 100)))
+    return edges, None
+
+
+# Synthetic graph generators by name, taking a node count and a seed
+GENERATORS = {
+    'grid': lambda num_nodes, seed: grid_edges(max(2, int(math.sqrt(num_nodes))), seed),
+    'geometric': lambda num_nodes, seed: random_geometric_edges(num_nodes, seed=seed),
+    'scale_free': lambda num_nodes, seed: scale_free_edges(num_nodes, seed=seed),
+}
+
+
+def build_graph(edges, positions=None):
+    '''Builds a Graph one add_edge call at a time and returns it with the build throughput in edges per second'''
+    start = time.perf_counter()
+    graph = Graph()
+    for node1, node2, weight in edges:
+        graph.add_edge(node1, node2, weight)
+    seconds = time.perf_counter() - start
+    if positions is not None:
+        for name, pos in positions.items():
+            graph.add_node(name).add_data('pos', pos)
+    return graph, len(edges) / seconds if seconds > 0 else math.inf
+
+
+def memory_per_edge(edges):
+    '''Measures the bytes allocated per edge while building a Graph'''
+    tracemalloc.start()
+    graph = Graph()
+    graph.add_edges_from(edges)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory / max(1, graph.num_edges)
+
+
+def random_queries(graph, count, seed=0):
+    '''Returns a list of random (start, end) pairs'''
+    rng = random.Random(seed)
+    nodes = graph.nodes
+    return [(rng.choice(nodes), rng.choice(nodes)) for _ in range(count)]
+
+
+def percentile(values, fraction):
+    '''Returns the nearest-rank percentile of a list of values'''
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def measure_queries(graph, algorithm, queries):
+    '''Runs every query and returns the latency percentiles in milliseconds and the mean number of settled nodes'''
+    latencies = []
+    settled = 0
+    for start, end in queries:
+        query_start = time.perf_counter()
+        search = algorithm(graph, start, end)
+        search.shortest_distance
+        latencies.append((time.perf_counter() - query_start) * 1000)
+        settled += search.num_settled
+    return {
+        'p50_ms': percentile(latencies, 0.5),
+        'p90_ms': percentile(latencies, 0.9),
+        'p99_ms': percentile(latencies, 0.99),
+        'mean_settled': settled / len(queries),
+    }
+
+
+def run_benchmark(generator, num_nodes, num_queries=20, seed=0, measure_memory=True):
+    '''Builds one synthetic graph and measures its construction and query performance'''
+    edges, positions = GENERATORS[generator](num_nodes, seed)
+    graph, edges_per_second = build_graph(edges, positions)
+    result = {
+        'generator': generator,
+        'nodes': graph.num_nodes,
+        'edges': graph.num_edges,
+        'build_edges_per_second': edges_per_second,
+        'bytes_per_edge': memory_per_edge(edges) if measure_memory else None,
+        'queries': {},
+    }
+
+    # A* needs 'pos' data, so only the Dijkstra variants run on graphs without positions
+    algorithms = {'Dijkstra': Dijkstra, 'BidirectionalDijkstra': BidirectionalDijkstra}
+    if positions is not None:
+        algorithms['A_Star'] = A_Star
+        algorithms['BidirectionalA_Star'] = BidirectionalA_Star
+    queries = random_queries(graph, num_queries, seed)
+    for name, algorithm in algorithms.items():
+        result['queries'][name] = measure_queries(graph, algorithm, queries)
+    compact_graph = graph.freeze()
+    result['queries']['Dijkstra (CompactGraph)'] = measure_queries(compact_graph, Dijkstra, queries)
+    return result
+
+
+def compare_minimum_spanning_trees(graph, repeats=3):
+    '''Runs Prim and Kruskal on a graph and returns the best time in seconds and the total weight of each'''
+    results = {}
+    for algorithm in [prim, kruskal]:
+        best = math.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            total_weight, _ = algorithm(graph)
+            best = min(best, time.perf_counter() - start)
+        results[algorithm.__name__] = {'seconds': best, 'total_weight': total_weight}
+    return results
+
+
+def run_mst_benchmark(sizes, seed=0):
+    '''Compares Prim and Kruskal on a sparse geometric graph and a dense random graph of each size.
+    The dense graph has about half of all possible edges, so its size is capped to keep it in memory.'''
+    results = []
+    for num_nodes in sizes:
+        for name, (edges, _) in [('geometric', random_geometric_edges(num_nodes, seed=seed)),
+                                 ('dense', dense_edges(min(num_nodes, 2000), seed=seed))]:
+            graph = Graph()
+            graph.add_edges_from(edges)
+            results.append({
+                'generator': name,
+                'nodes': graph.num_nodes,
+                'edges': graph.num_edges,
+                'algorithms': compare_minimum_spanning_trees(graph),
+            })
+    return results
+
+
+def run_suite(generators, sizes, num_queries=20, seed=0, measure_memory=True):
+    '''Runs the benchmark for every generator and size and returns the machine readable results'''
+    results = []
+    for generator in generators:
+        for num_nodes in sizes:
+            results.append(run_benchmark(generator, num_nodes, num_queries, seed, measure_memory))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'queries': num_queries,
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.1):
+    '''Compares two suite results and returns a list of regressions larger than the threshold fraction'''
+    def metrics(results):
+        '''Flattens the results into {(generator, nodes, metric): (value, higher_is_better)}'''
+        flat = {}
+        for result in results['results']:
+            key = (result['generator'], result['nodes'])
+            flat[key + ('build_edges_per_second',)] = (result['build_edges_per_second'], True)
+            if result['bytes_per_edge'] is not None:
+                flat[key + ('bytes_per_edge',)] = (result['bytes_per_edge'], False)
+            for algorithm, measured in result['queries'].items():
+                flat[key + (algorithm + ' p50_ms',)] = (measured['p50_ms'], False)
+                flat[key + (algorithm + ' mean_settled',)] = (measured['mean_settled'], False)
+        return flat
+
+    regressions = []
+    baseline_metrics = metrics(baseline)
+    for key, (value, higher_is_better) in metrics(current).items():
+        if key not in baseline_metrics:
+            continue
+        old_value = baseline_metrics[key][0]
+        if old_value == 0:
+            continue
+        change = (value - old_value) / old_value
+        if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+            regressions.append((key, old_value, value))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark Graph construction and shortest path queries')
+    parser.add_argument('--generators', nargs='+', default=list(GENERATORS), choices=list(GENERATORS),
+                        help='synthetic graph generators to run')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000], help='node counts, e.g. 1000 10000 100000 1000000')
+    parser.add_argument('--queries', type=int, default=20, help='number of random queries per graph')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--no-memory', action='store_true', help='skip the memory per edge measurement')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='compare against the JSON results of an earlier run')
+    parser.add_argument('--mst', action='store_true', help='also compare Prim and Kruskal on sparse and dense graphs')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    args = parser.parse_args()
+
+    suite = run_suite(args.generators, args.sizes, args.queries, args.seed, not args.no_memory)
+    for result in suite['results']:
+        memory = f"{result['bytes_per_edge']:.0f} B/edge" if result['bytes_per_edge'] is not None else ''
+        print(f"{result['generator']} graph: {result['nodes']} nodes, {result['edges']} edges, "
+              f"{result['build_edges_per_second']:,.0f} edges/s {memory}")
+        for algorithm, measured in result['queries'].items():
+            print(f"  {algorithm:26} p50 {measured['p50_ms']:9.2f} ms  p90 {measured['p90_ms']:9.2f} ms  "
+                  f"p99 {measured['p99_ms']:9.2f} ms  {measured['mean_settled']:10.1f} settled")
+
+    if args.mst:
+        suite['mst'] = run_mst_benchmark(args.sizes, args.seed)
+        for result in suite['mst']:
+            print(f"{result['generator']} graph: {result['nodes']} nodes, {result['edges']} edges")
+            for algorithm, measured in result['algorithms'].items():
+                print(f"  {algorithm:26} {measured['seconds'] * 1000:9.2f} ms  total weight {measured['total_weight']:g}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(suite, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare_results(json.load(file), suite, args.threshold)
+        for (generator, nodes, metric), old_value, value in regressions:
+            print(f'REGRESSION {generator} {nodes} {metric}: {old_value:.4g} -> {value:.4g}')
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,155 @@
+from weight_profiles import cost_array
+from array import array
+import math
+
+# Number of weighted sum cost arrays a CompactGraph keeps for later searches
+MAX_COST_ARRAYS = 8
+
+
+class CompactGraph():
+    '''Read-only snapshot of a Graph for fast shortest path queries.
+    Nodes are numbered 0 to n-1 and the adjacency is stored in compressed sparse row (CSR) arrays:
+    the neighbors of node i are _targets[_offsets[i]:_offsets[i+1]] with the matching _weights.
+    A directed snapshot stores the outgoing edges only, and a multi-criteria snapshot keeps one weight array per
+    criterion, from which searches pick or combine the costs they need.'''
+
+    def __init__(self, names, offsets, targets, weights, x=None, y=None, directed=False, criteria=None, columns=None):
+        '''Initialize the snapshot from its node names and CSR buffers'''
+        self._names = names
+        self.directed = directed
+        # Names of the criteria, and one weight array per criterion in the same order as _targets
+        self.criteria = criteria
+        self._columns = columns if columns is not None else [weights]
+        # Weight arrays already built for weighted sums of the criteria, oldest first
+        self._cost_arrays = {}
+        self._index = None
+        self._offsets = offsets
+        self._targets = targets
+        self._weights = weights
+        # Node positions, or None if the graph has no 'pos' data
+        self._x = x
+        self._y = y
+
+    @classmethod
+    def from_graph(cls, graph):
+        '''Builds a snapshot of a Graph'''
+        names = graph.nodes
+        index = {name: i for i, name in enumerate(names)}
+        offsets = array('q', [0])
+        targets = array('q')
+        criteria = graph.criteria
+        columns = [array('d') for _ in criteria] if criteria else [array('d')]
+        weights = columns[0]
+        x = array('d')
+        y = array('d')
+        has_pos = False
+
+        # Loop through the nodes in order and append their edges to the CSR arrays
+        for name in names:
+            node = graph.get_node(name)
+            for neighbor, edge in node._edges.items():
+                targets.append(index[neighbor])
+                if criteria:
+                    for column, cost in zip(columns, edge.weight):
+                        column.append(cost)
+                else:
+                    weights.append(edge.weight)
+            offsets.append(len(targets))
+            # Store the position if the node has one, otherwise mark it as missing
+            pos = node._data.get('pos') if node._data else None
+            if pos is None:
+                x.append(math.nan)
+                y.append(math.nan)
+            else:
+                has_pos = True
+                x.append(pos[0])
+                y.append(pos[1])
+
+        compact_graph = cls(names, offsets, targets, weights, x if has_pos else None, y if has_pos else None,
+                            graph.directed, criteria, columns)
+        compact_graph._index = index
+        return compact_graph
+
+    @property
+    def is_empty(self):
+        '''Returns true if the graph has no nodes'''
+        return len(self._names) == 0
+
+    @property
+    def num_nodes(self):
+        '''Returns the number of nodes in the graph'''
+        return len(self._names)
+
+    @property
+    def num_edges(self):
+        '''Returns the number of edges in the graph (each undirected edge is stored twice)'''
+        return len(self._targets) if self.directed else len(self._targets) // 2
+
+    @property
+    def nodes(self):
+        '''Returns the list of node names in the graph'''
+        return list(self._names)
+
+    @property
+    def has_positions(self):
+        '''Returns true if the nodes carry 'pos' data'''
+        return self._x is not None
+
+    @property
+    def nbytes(self):
+        '''Returns the number of bytes used by the CSR and position buffers'''
+        buffers = [self._offsets, self._targets, self._x, self._y] + self._columns
+        return sum(len(buffer) * buffer.itemsize for buffer in buffers if buffer is not None)
+
+    def __contains__(self, name):
+        '''Checks whether a node name is in the graph'''
+        return name in self._get_index()
+
+    def _get_index(self):
+        '''Returns the dictionary from node names to node numbers, building it on first use'''
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self._names)}
+        return self._index
+
+    def get_node(self, nodeName):
+        '''Returns the number of the node with a specified name'''
+        index = self._get_index()
+        assert nodeName in index, "Node does not exist in graph"
+        return index[nodeName]
+
+    def get_name(self, node):
+        '''Returns the name of a node number'''
+        return self._names[node]
+
+    def cost_weights(self, weight=None):
+        '''Returns the array of edge costs for a weight selection, in the same order as the targets.
+        Criteria are returned as they are stored, and weighted sums are built once and kept for the next searches.
+        A function is evaluated over every edge again for each search, since a new function object is usually
+        made for every query. See weight_profiles.cost_function for the ways to select a cost.'''
+        if weight is None:
+            return self._weights
+        if not isinstance(weight, dict):
+            return cost_array(self.criteria, self._columns, weight)
+        key = tuple(sorted(weight.items()))
+        weights = self._cost_arrays.get(key)
+        if weights is None:
+            weights = cost_array(self.criteria, self._columns, weight)
+            # Keep only the most recent weighted sums so the cache cannot grow without bound
+            if len(self._cost_arrays) >= MAX_COST_ARRAYS:
+                del self._cost_arrays[next(iter(self._cost_arrays))]
+            self._cost_arrays[key] = weights
+        return weights
+
+    def get_position(self, node):
+        '''Returns the (x, y) position of a node number'''
+        assert self.has_positions, "Graph has no 'pos' data"
+        return (self._x[node], self._y[node])
+
+    def neighbors(self, nodeName):
+        '''Returns a list of the names of all nodes adjacent to a node'''
+        node = self.get_node(nodeName)
+        return [self._names[target] for target in self._targets[self._offsets[node]:self._offsets[node + 1]]]
+
+    def adjacent(self, node1, node2):
+        '''Checks whether two nodes share an edge'''
+        return node2 in self.neighbors(node1)
@@ -0,0 +1,265 @@
+from compact_graph import CompactGraph
+from array import array
+import heapq
+import math
+
+
+class ContractionHierarchy():
+    '''Preprocessed graph for fast point to point queries.
+    Nodes are contracted one at a time from least to most important. Contracting a node adds a shortcut
+    between two of its neighbors whenever the only shortest path between them ran through that node.
+    A query then only has to search upward in the hierarchy from both ends.'''
+
+    def __init__(self, names, ranks, offsets, targets, weights, middles):
+        '''Initialize the hierarchy from its node names, node ranks and upward edges in CSR arrays.
+        The middle of an edge is the contracted node a shortcut skips, or -1 for an original edge.'''
+        self._names = names
+        self._index = {name: i for i, name in enumerate(names)}
+        self._ranks = ranks
+        self._offsets = offsets
+        self._targets = targets
+        self._weights = weights
+        self._middles = middles
+
+    @classmethod
+    def build(cls, graph, witness_limit=50):
+        '''Builds the hierarchy from a Graph or CompactGraph.
+        witness_limit bounds the number of nodes settled by each witness search; a higher limit adds fewer shortcuts.'''
+        if not isinstance(graph, CompactGraph):
+            graph = graph.freeze()
+        assert not graph.directed, "Preprocessing needs an undirected graph"
+        num_nodes = graph.num_nodes
+
+        # Remaining graph as one dictionary per node of neighbor -> (weight, middle)
+        adjacency = [{} for _ in range(num_nodes)]
+        for node in range(num_nodes):
+            for i in range(graph._offsets[node], graph._offsets[node + 1]):
+                neighbor = graph._targets[i]
+                weight = graph._weights[i]
+                if neighbor not in adjacency[node] or weight < adjacency[node][neighbor][0]:
+                    adjacency[node][neighbor] = (weight, -1)
+
+        contracted_neighbors = [0] * num_nodes
+        ranks = array('q', [0]) * num_nodes
+        upward = [None] * num_nodes
+
+        def shortcuts_for(node):
+            '''Returns the shortcuts needed to contract a node, as (neighbor1, neighbor2, weight) triples'''
+            neighbors = list(adjacency[node].items())
+            shortcuts = []
+            for i, (source, (source_weight, _)) in enumerate(neighbors):
+                targets = {target: source_weight + weight for target, (weight, _) in neighbors[i + 1:]}
+                if not targets:
+                    continue
+                witnesses = _witness_search(adjacency, source, node, targets, max(targets.values()), witness_limit)
+                for target, distance in targets.items():
+                    if witnesses.get(target, math.inf) > distance:
+                        shortcuts.append((source, target, distance))
+            return shortcuts
+
+        def priority(node):
+            '''Returns the edge difference plus the number of contracted neighbors, which spreads the contraction
+            over the graph, together with the shortcuts it was computed from'''
+            shortcuts = shortcuts_for(node)
+            return len(shortcuts) - len(adjacency[node]) + contracted_neighbors[node], shortcuts
+
+        queue = [(priority(node)[0], node) for node in range(num_nodes)]
+        heapq.heapify(queue)
+        rank = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            # Lazy update: recompute the priority and put the node back if it is no longer the smallest
+            current_priority, shortcuts = priority(node)
+            if queue and current_priority > queue[0][0]:
+                heapq.heappush(queue, (current_priority, node))
+                continue
+
+            # Contract the node with the shortcuts the lazy update just found, instead of repeating its witness searches.
+            # Its remaining neighbors all get a higher rank, so its edges point upward.
+            for source, target, distance in shortcuts:
+                if distance < adjacency[source].get(target, (math.inf, -1))[0]:
+                    adjacency[source][target] = (distance, node)
+                    adjacency[target][source] = (distance, node)
+            upward[node] = adjacency[node]
+            for neighbor in adjacency[node]:
+                del adjacency[neighbor][node]
+                contracted_neighbors[neighbor] += 1
+            adjacency[node] = {}
+            ranks[node] = rank
+            rank += 1
+
+        # Store the upward edges in CSR arrays
+        offsets = array('q', [0])
+        targets = array('q')
+        weights = array('d')
+        middles = array('q')
+        for node in range(num_nodes):
+            for neighbor, (weight, middle) in upward[node].items():
+                targets.append(neighbor)
+                weights.append(weight)
+                middles.append(middle)
+            offsets.append(len(targets))
+
+        return cls(graph.nodes, ranks, offsets, targets, weights, middles)
+
+    @property
+    def num_nodes(self):
+        '''Returns the number of nodes in the hierarchy'''
+        return len(self._names)
+
+    @property
+    def num_shortcuts(self):
+        '''Returns the number of shortcut edges added by the contraction'''
+        return sum(1 for middle in self._middles if middle != -1)
+
+    def __contains__(self, name):
+        '''Checks whether a node name is in the hierarchy'''
+        return name in self._index
+
+    def query(self, start_node, end_node):
+        '''Returns a query between two node names'''
+        return ContractionHierarchyQuery(self, start_node, end_node)
+
+    def _unpack(self, node1, node2, path):
+        '''Appends the original nodes between two nodes joined by an upward edge, ending with node2'''
+        low, high = (node1, node2) if self._ranks[node1] < self._ranks[node2] else (node2, node1)
+        # Find the middle node of the edge among the upward edges of its lower ranked end
+        for i in range(self._offsets[low], self._offsets[low + 1]):
+            if self._targets[i] == high:
+                middle = self._middles[i]
+                break
+        if middle == -1:
+            path.append(node2)
+        else:
+            self._unpack(node1, middle, path)
+            self._unpack(middle, node2, path)
+
+
+def _witness_search(adjacency, source, skipped, targets, max_distance, limit):
+    '''Local Dijkstra from source that avoids the node being contracted.
+    Returns the distances found to the targets, giving up after max_distance or after settling limit nodes.'''
+    distances = {source: 0}
+    found = {}
+    heap = [(0, source)]
+    settled = 0
+    while heap and settled < limit and len(found) < len(targets):
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        if distance > max_distance:
+            break
+        settled += 1
+        if node in targets:
+            found[node] = distance
+        for neighbor, (weight, _) in adjacency[node].items():
+            if neighbor == skipped:
+                continue
+            new_distance = distance + weight
+            if new_distance < distances.get(neighbor, math.inf):
+                distances[neighbor] = new_distance
+                heapq.heappush(heap, (new_distance, neighbor))
+    # Targets that were reached but not settled still have a valid upper bound
+    for target in targets:
+        if target not in found and target in distances:
+            found[target] = distances[target]
+    return found
+
+
+class ContractionHierarchyQuery():
+    '''Point to point query on a ContractionHierarchy with the same shortest_path and shortest_distance
+    properties as the other shortest path algorithms'''
+
+    def __init__(self, hierarchy, start_node, end_node):
+        assert start_node in hierarchy, "Start node must be a node in the Graph"
+        assert end_node in hierarchy, "End node must be a node in the Graph"
+        self.hierarchy = hierarchy
+        self.start_node = hierarchy._index[start_node]
+        self.end_node = hierarchy._index[end_node]
+        self._shortest_path = None
+        self._shortest_distance = None
+        self._num_settled = 0
+        self._searched = False
+
+    def _shortest_paths(self):
+        '''Runs an upward search from both ends and records the best meeting node'''
+        if self._searched:
+            return
+        hierarchy = self.hierarchy
+        offsets = hierarchy._offsets
+        targets = hierarchy._targets
+        weights = hierarchy._weights
+        # Distances and previous nodes of the forward (0) and backward (1) searches
+        distances = ({self.start_node: 0}, {self.end_node: 0})
+        self._previous = ({self.start_node: -1}, {self.end_node: -1})
+        heaps = ([(0, self.start_node)], [(0, self.end_node)])
+        settled = (set(), set())
+        best_distance = math.inf
+        meeting_node = -1
+
+        while heaps[0] or heaps[1]:
+            for side in (0, 1):
+                heap = heaps[side]
+                if not heap:
+                    continue
+                distance, node = heapq.heappop(heap)
+                # A side is finished once its smallest distance is no better than the best path found
+                if distance >= best_distance:
+                    heap.clear()
+                    continue
+                if node in settled[side]:
+                    continue
+                settled[side].add(node)
+                if node in distances[1 - side] and distance + distances[1 - side][node] < best_distance:
+                    best_distance = distance + distances[1 - side][node]
+                    meeting_node = node
+                for i in range(offsets[node], offsets[node + 1]):
+                    neighbor = targets[i]
+                    new_distance = distance + weights[i]
+                    if new_distance < distances[side].get(neighbor, math.inf):
+                        distances[side][neighbor] = new_distance
+                        self._previous[side][neighbor] = node
+                        heapq.heappush(heap, (new_distance, neighbor))
+
+        self._num_settled = len(settled[0]) + len(settled[1])
+        self._meeting_node = meeting_node
+        self._best_distance = best_distance
+        self._searched = True
+
+    @property
+    def shortest_path(self):
+        '''Displays the shortest path between the start node and the end node, unpacked to the original nodes'''
+        if self._shortest_path is None:
+            self._shortest_paths()
+            assert self._meeting_node != -1, "End node is not reachable from the start node"
+            # Collect the upward path from the start to the meeting node and the downward path to the end
+            nodes = []
+            node = self._meeting_node
+            while node != -1:
+                nodes.append(node)
+                node = self._previous[0][node]
+            nodes.reverse()
+            node = self._previous[1][self._meeting_node]
+            while node != -1:
+                nodes.append(node)
+                node = self._previous[1][node]
+
+            # Replace every shortcut with the nodes it skips
+            path = [nodes[0]]
+            for node1, node2 in zip(nodes, nodes[1:]):
+                self.hierarchy._unpack(node1, node2, path)
+            self._shortest_path = [self.hierarchy._names[node] for node in path]
+        return list(self._shortest_path)
+
+    @property
+    def shortest_distance(self):
+        '''Gets the total distance from the start node to the end node'''
+        if self._shortest_distance is None:
+            self._shortest_paths()
+            self._shortest_distance = self._best_distance
+        return self._shortest_distance
+
+    @property
+    def num_settled(self):
+        '''Returns the number of nodes settled by the query'''
+        self._shortest_paths()
+        return self._num_settled
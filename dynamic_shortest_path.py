@@ -0,0 +1,130 @@
+from shortest_path import ShortestPathTree
+import heapq
+import itertools
+import math
+
+
+class DynamicShortestPathTree(ShortestPathTree):
+    '''Shortest path tree from a single source that stays correct while the Graph changes.
+    The tree subscribes to the graph's change notifications and repairs only the nodes that are affected:
+    a shorter edge is propagated outward from its end, and a longer tree edge or a removed node
+    only recomputes the subtree that hung below it.'''
+
+    def __init__(self, graph, source):
+        assert source in graph, "Source node must be a node in the Graph"
+        assert not graph.directed and graph.criteria is None, "Tree repair needs an undirected graph with single weights"
+        super().__init__(source, {}, {})
+        self.graph = graph
+        # Children of every node in the tree, so a subtree can be found without scanning the graph
+        self._children = {}
+        # Tie breaker for heap entries, since node names are not always comparable
+        self._counter = itertools.count()
+        # Number of nodes whose distance changed in the last repair
+        self.num_repaired = 0
+        self._set(source, 0, None)
+        self._propagate([(0, next(self._counter), source)])
+        self._version = graph.version
+        graph.subscribe(self._on_change)
+
+    def close(self):
+        '''Stops following the changes of the graph'''
+        self.graph.unsubscribe(self._on_change)
+
+    @property
+    def is_current(self):
+        '''Returns true if the tree reflects the latest version of the graph'''
+        return self._version == self.graph.version
+
+    def _set(self, node, distance, predecessor):
+        '''Records the distance and predecessor of a node and moves it under its new parent'''
+        old_predecessor = self._predecessors.get(node)
+        if old_predecessor is not None and old_predecessor in self._children:
+            self._children[old_predecessor].discard(node)
+        self._distances[node] = distance
+        self._predecessors[node] = predecessor
+        if predecessor is not None:
+            self._children.setdefault(predecessor, set()).add(node)
+        self.num_repaired += 1
+
+    def _propagate(self, heap):
+        '''Runs Dijkstra from the nodes in the heap, only continuing through nodes whose distance improves'''
+        nodes = self.graph._nodes
+        while heap:
+            distance, _, node = heapq.heappop(heap)
+            if distance > self._distances.get(node, math.inf):
+                continue
+            for neighbor, weight in nodes[node].iter_neighbors():
+                new_distance = distance + weight
+                if new_distance < self._distances.get(neighbor, math.inf):
+                    self._set(neighbor, new_distance, node)
+                    heapq.heappush(heap, (new_distance, next(self._counter), neighbor))
+
+    def _relax(self, node1, node2, weight):
+        '''Propagates a new or shorter edge in whichever direction it improves'''
+        heap = []
+        for start, end in [(node1, node2), (node2, node1)]:
+            distance = self._distances.get(start, math.inf) + weight
+            if distance < self._distances.get(end, math.inf):
+                self._set(end, distance, start)
+                heap.append((distance, next(self._counter), end))
+        heapq.heapify(heap)
+        self._propagate(heap)
+
+    def _repair_subtree(self, root):
+        '''Recomputes the distances of a node and everything below it in the tree'''
+        # Collect the subtree and remove it from the tree
+        subtree = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            subtree.append(node)
+            stack.extend(self._children.pop(node, ()))
+        parent = self._predecessors.get(root)
+        if parent is not None and parent in self._children:
+            self._children[parent].discard(root)
+        for node in subtree:
+            del self._distances[node]
+            del self._predecessors[node]
+
+        # Reconnect every subtree node that is still in the graph through its best neighbor outside the subtree
+        nodes = self.graph._nodes
+        heap = []
+        for node in subtree:
+            if node not in nodes:
+                continue
+            best_distance = math.inf
+            best_neighbor = None
+            for neighbor, weight in nodes[node].iter_neighbors():
+                distance = self._distances.get(neighbor, math.inf) + weight
+                if distance < best_distance:
+                    best_distance = distance
+                    best_neighbor = neighbor
+            if best_neighbor is not None:
+                self._set(node, best_distance, best_neighbor)
+                heap.append((best_distance, next(self._counter), node))
+        heapq.heapify(heap)
+        self._propagate(heap)
+
+    def _on_change(self, event, data):
+        '''Repairs the tree after a change to the graph'''
+        self.num_repaired = 0
+        if event == 'add_edge':
+            node1, node2, old_weight, new_weight = data
+            if old_weight is not None and new_weight > old_weight:
+                # A longer edge only matters if the tree uses it
+                if self._predecessors.get(node2) == node1:
+                    self._repair_subtree(node2)
+                elif self._predecessors.get(node1) == node2:
+                    self._repair_subtree(node1)
+            else:
+                self._relax(node1, node2, new_weight)
+        elif event == 'remove_node':
+            name = data[0]
+            if name == self.source:
+                # Without its source the tree is empty
+                self._distances.clear()
+                self._predecessors.clear()
+                self._children.clear()
+            elif name in self._distances:
+                self._repair_subtree(name)
+        self._version = self.graph.version
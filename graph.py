@@ -1,21 +1,45 @@
+from compact_graph import CompactGraph
+from minimum_spanning_tree import prim, kruskal
+from weight_profiles import cost_function
+from array import array
+
 class Graph:
     '''Class that contains an adjacency map representation of a Graph'''
 
     class Node:
-        def __init__(self, name):
+        # Slots keep nodes small by leaving out the per-instance __dict__
+        __slots__ = ('name', '_edges', '_in_edges', '_data')
+
+        def __init__(self, name, directed=False):
             '''Initialize a new node'''
             self.name = name
+            # Outgoing edges by the name of the node they lead to
             self._edges = {}
-            # Data property for storing additional information on the node
-            # For example, position
-            self.data = {}
+            # Incoming edges by the name of the node they come from. Undirected nodes share one dictionary for both.
+            self._in_edges = {} if directed else self._edges
+            # Data dictionary for storing additional information on the node, for example position.
+            # It is only created once the first value is added.
+            self._data = None
+
+        @property
+        def data(self):
+            '''Returns the dictionary of additional properties of the node'''
+            if self._data is None:
+                self._data = {}
+            return self._data
 
         def __eq__(self, other):
             '''Two nodes are considered equal if they have the same name'''
+            if not isinstance(other, Graph.Node):
+                return NotImplemented
             if self.name == other.name:
                 return True
             else:
                 return False
+
+        def __hash__(self):
+            '''Hash the node by its name so that it is consistent with equality'''
+            return hash(self.name)
                        
         def __repr__(self):
             '''Print the name of the node'''
@@ -26,14 +50,14 @@ class Graph:
             if edge.node1 == self:
                 self._edges[edge.node2.name] = edge
             elif edge.node2 == self:
-                self._edges[edge.node1.name] = edge
+                self._in_edges[edge.node1.name] = edge
 
         def _remove_edge(self, edge):
             '''Remove an edge from the node's list of edges'''
             if edge.node1 == self:
                 del self._edges[edge.node2.name]
             elif edge.node2 == self:
-                del self._edges[edge.node1.name]
+                del self._in_edges[edge.node1.name]
 
         def get_edges(self):
             '''Return all edges connected to the node'''
@@ -43,22 +67,51 @@ class Graph:
             '''Return the names of all nodes connected to the edge'''
             return list(self._edges.keys()) 
 
+        def iter_neighbors(self):
+            '''Iterates over (neighbor name, weight) pairs straight from the adjacency dictionary, without building a list'''
+            for name, edge in self._edges.items():
+                yield name, edge.weight
+
+        def iter_edges(self):
+            '''Returns a live view of the edges connected to the node'''
+            return self._edges.values()
+
+        def iter_in_neighbors(self):
+            '''Iterates over (neighbor name, weight) pairs of the incoming edges, which are the same as
+            the outgoing ones in an undirected graph'''
+            for name, edge in self._in_edges.items():
+                yield name, edge.weight
+
+        def adjacent_names(self):
+            '''Returns a live view of the names of all nodes connected to the node, which supports O(1) membership tests'''
+            return self._edges.keys()
+
+        @property
+        def degree(self):
+            '''Returns the number of edges connected to the node'''
+            return len(self._edges)
+
         def add_data(self, key, value):
             '''Adds a custom additional property to the node'''
             self.data[key] = value
 
         def get_data(self, key):
             '''Access a custom additional property of the node'''
-            return self.data[key]
+            if self._data is None:
+                raise KeyError(key)
+            return self._data[key]
 
 
 
 
 
     class Edge:
+        # Slots keep edges small by leaving out the per-instance __dict__
+        __slots__ = ('node1', 'node2', 'weight')
+
         def __init__(self, node1, node2, weight):
             '''Initialize a new edge'''
-            assert node1 != node2, "Edge cannot have the same start and end node"
+            assert node1.name != node2.name, "Edge cannot have the same start and end node"
             self.node1 = node1
             self.node2 = node2
             self.weight = weight
@@ -79,13 +132,80 @@ class Graph:
         
         def __repr__(self):
             '''Print the nodes and weight of the edge'''
-            return f'{self.node1} - {self.node2}: {self.weight}'
+            return f'{self.node1} - {self.node2}: {_format_weight(self.weight)}'
+
+
+    class DirectedEdge(Edge):
+        __slots__ = ()
+
+        def __eq__(self, other):
+            '''Two directed edges are considered equal if they go from the same node to the same node'''
+            return self.node1 == other.node1 and self.node2 == other.node2
+
+        def __hash__(self):
+            '''Use the ordered pair of node names to hash the edge'''
+            return hash((self.node1.name, self.node2.name))
+
+        def __repr__(self):
+            '''Print the nodes and weight of the edge'''
+            return f'{self.node1} -> {self.node2}: {_format_weight(self.weight)}'
             
           
-    def __init__(self):
-        '''Initialize a new graph with a list of nodes and edges'''
+    def __init__(self, directed=False, criteria=None):
+        '''Initialize a new graph with a list of nodes and edges.
+        A directed graph keeps separate outgoing and incoming edges for every node. If criteria names several
+        costs, such as ('time', 'distance', 'toll'), every edge weight is a sequence with one cost per criterion.'''
+        self.directed = directed
+        self.criteria = tuple(criteria) if criteria is not None else None
+        self._edge_class = self.DirectedEdge if directed else self.Edge
         self._nodes = {}
-        self._edges = {}
+        # Edges are only stored in the adjacency dictionaries of their two nodes, so the graph just counts them
+        self._num_edges = 0
+        # The version goes up on every change, so cached results can cheaply check whether they are stale
+        self._version = 0
+        # Callbacks that are told about every change to the graph
+        self._listeners = []
+
+    def __getstate__(self):
+        '''Pickle the graph as flat lists of nodes and edges, which avoids deep recursion through the node objects'''
+        nodes = [(node.name, node._data) for node in self._nodes.values()]
+        edges = [(edge.node1.name, edge.node2.name, edge.weight) for edge in self.edges]
+        return {'nodes': nodes, 'edges': edges, 'directed': self.directed, 'criteria': self.criteria}
+
+    def __setstate__(self, state):
+        '''Rebuild the graph from the flat lists of nodes and edges'''
+        self.__init__(state.get('directed', False), state.get('criteria'))
+        for name, data in state['nodes']:
+            node = self.add_node(name)
+            if data:
+                node.data.update(data)
+        for node1, node2, weight in state['edges']:
+            self.add_edge(node1, node2, weight)
+
+    def __contains__(self, nodeName):
+        '''Checks whether a node with a specified name is in the graph'''
+        return nodeName in self._nodes
+
+    @property
+    def version(self):
+        '''Returns a counter that increases every time nodes or edges are added, removed or re-weighted'''
+        return self._version
+
+    def subscribe(self, listener):
+        '''Registers a callback that is called as listener(event, data) after every change to the graph.
+        The events are ('add_node', (name,)), ('add_edge', (node1, node2, old_weight, new_weight)) with an
+        old_weight of None for a new edge, and ('remove_node', (name, [(neighbor, weight), ...])).'''
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        '''Removes a callback registered with subscribe'''
+        self._listeners.remove(listener)
+
+    def _notify(self, event, data):
+        '''Increases the version and tells every listener about a change'''
+        self._version += 1
+        for listener in list(self._listeners):
+            listener(event, data)
 
     @property
     def is_empty(self):
@@ -100,7 +220,7 @@ class Graph:
     @property
     def num_edges(self):
         '''Returns the number of edges associated with the graph'''
-        return len(self._edges)
+        return self._num_edges
 
     @property
     def nodes(self):
@@ -109,9 +229,26 @@ class Graph:
     
     @property
     def edges(self):
-        '''Returns the list of nodes in the graph'''
-        return list(self._edges.values())
+        '''Returns the list of edges in the graph'''
+        # Every edge is stored by both of its nodes, so only take it from its first node
+        return [edge for node in self._nodes.values() for edge in node._edges.values() if edge.node1 is node]
     
+    def iter_nodes(self):
+        '''Returns a live view of the node names in the graph'''
+        return self._nodes.keys()
+
+    def iter_edges(self):
+        '''Iterates over the edges in the graph without building a list'''
+        for node in self._nodes.values():
+            for edge in node._edges.values():
+                # Every edge is stored by both of its nodes, so only take it from its first node
+                if edge.node1 is node:
+                    yield edge
+
+    def iter_neighbors(self, node):
+        '''Iterates over the (neighbor name, weight) pairs of a node without building a list'''
+        return self._nodes[node].iter_neighbors()
+
     @property
     def adjacency_map(self):
         '''Returns the adjacency map of the graph'''
@@ -127,9 +264,33 @@ class Graph:
         '''Creates a new node if it does not already exist and adds it to the graph'''
         # Check if the node is not in the list of nodes
         if nodeName not in self._nodes.keys():
-            self._nodes[nodeName] = self.Node(nodeName)
+            self._nodes[nodeName] = self.Node(nodeName, self.directed)
+            self._notify('add_node', (nodeName,))
         return self._nodes[nodeName]
 
+    def freeze(self):
+        '''Returns a read-only CompactGraph snapshot of the graph for fast shortest path queries'''
+        return CompactGraph.from_graph(self)
+
+    def cost_function(self, weight=None):
+        '''Returns the function that turns an edge weight into the cost selected by weight, or None if the
+        weight is used as it is. See weight_profiles.cost_function for the ways to select a cost.'''
+        return cost_function(self.criteria, weight)
+
+    def _edge_weight(self, weight):
+        '''Stores the costs of a multi-criteria edge in a compact array, checking there is one per criterion'''
+        if self.criteria is None:
+            return weight
+        costs = array('d', weight)
+        assert len(costs) == len(self.criteria), "Edge needs one cost per criterion"
+        return costs
+
+    def minimum_spanning_tree(self, algorithm='prim'):
+        '''Returns the total weight and the list of edges of a minimum spanning tree, found with 'prim' or 'kruskal'.
+        If the graph is not connected a minimum spanning forest is returned instead.'''
+        assert algorithm in ('prim', 'kruskal'), "Algorithm must be 'prim' or 'kruskal'"
+        return prim(self) if algorithm == 'prim' else kruskal(self)
+
     def get_node(self, nodeName):
         '''Retrieves the node object with a specified name in a graph'''
         assert nodeName in self._nodes.keys(), "Node does not exist in graph"
@@ -141,52 +302,110 @@ class Graph:
         # Adds nodes to node list if not already there
         node1 = self.add_node(node1)
         node2 = self.add_node(node2)
-        # Creates an Edge between the two nodes with the weight
-        new_edge = self.Edge(node1, node2, weight)
-        
+        weight = self._edge_weight(weight)
         # Check that there's an already an edge between the two nodes
-        if new_edge not in self._edges:
-            # Add the edge to the list of edges and add the edge to the list of edges for each node
-            self._edges[new_edge] = new_edge
-            self._nodes[node1.name]._add_edge(new_edge)
-            self._nodes[node2.name]._add_edge(new_edge)
+        existing_edge = node1._edges.get(node2.name)
+        if existing_edge is None:
+            # Creates an Edge between the two nodes with the weight and adds it to the list of edges for each node
+            new_edge = self._edge_class(node1, node2, weight)
+            node1._add_edge(new_edge)
+            node2._add_edge(new_edge)
+            self._num_edges += 1
+            self._notify('add_edge', (node1.name, node2.name, None, weight))
         
         else:
-            # If there is already an edge, update the weight
-            self._edges[new_edge].weight = new_edge.weight
-            self._nodes[node1.name]._edges[node2] = new_edge.weight
-            self._nodes[node2.name]._edges[node1] = new_edge.weight
+            # If there is already an edge, update its weight. Both nodes refer to the same edge object.
+            old_weight = existing_edge.weight
+            existing_edge.weight = weight
+            self._notify('add_edge', (node1.name, node2.name, old_weight, weight))
+
+    def add_edges_from(self, edges):
+        '''Adds every (node1, node2, weight) triple from an iterable of edges to the graph.
+        This does the same thing as calling add_edge for each edge, but without the per-call overhead.'''
+        # Listeners need to hear about every single change, so use add_edge for each edge
+        if self._listeners:
+            for node1, node2, weight in edges:
+                self.add_edge(node1, node2, weight)
+            return
+        # Bind the lookups to local names once for the whole loop
+        nodes = self._nodes
+        Node = self.Node
+        Edge = self._edge_class
+        directed = self.directed
+        edge_weight = self._edge_weight if self.criteria is not None else None
+        added = 0
+        for name1, name2, weight in edges:
+            # Adds nodes to node list if not already there
+            node1 = nodes.get(name1)
+            if node1 is None:
+                node1 = nodes[name1] = Node(name1, directed)
+            node2 = nodes.get(name2)
+            if node2 is None:
+                node2 = nodes[name2] = Node(name2, directed)
+            if edge_weight is not None:
+                weight = edge_weight(weight)
+            existing_edge = node1._edges.get(name2)
+            if existing_edge is None:
+                # Create the edge and add it to the list of edges for each node
+                new_edge = Edge(node1, node2, weight)
+                node1._edges[name2] = new_edge
+                node2._in_edges[name1] = new_edge
+                added += 1
+            else:
+                # If there is already an edge, update its weight
+                existing_edge.weight = weight
+        self._num_edges += added
+        self._version += 1
 
     def get_edge(self, node1, node2):
-        '''Retrieves the edge object with a specified nodes in a graph'''
-        lookup_edge = self.Edge(node1, node2, 1)
-        assert lookup_edge in self._edges.keys(), "Edge does not exist in graph"
-        return self._edges[lookup_edge]
+        '''Retrieves the edge object with a specified nodes in a graph.
+        The nodes can be given as node objects or as node names.'''
+        if isinstance(node1, Graph.Node):
+            node1 = node1.name
+        if isinstance(node2, Graph.Node):
+            node2 = node2.name
+        assert node1 in self._nodes and node2 in self._nodes[node1]._edges, "Edge does not exist in graph"
+        return self._nodes[node1]._edges[node2]
 
     def adjacent(self, node1, node2):
         '''Checks whether two nodes share an edge'''
-        return node2 in self._nodes[node1].get_adjacent_nodes()
+        # A dictionary lookup instead of a scan through a list of the neighbors
+        return node2 in self._nodes[node1]._edges
     
     def neighbors(self, node):
         '''Returns a list of all nodes that are adjacent to a node'''
         return self._nodes[node].get_adjacent_nodes()
+
+    def predecessors(self, node):
+        '''Returns a list of all nodes with an edge into a node, which are its neighbors in an undirected graph'''
+        return list(self._nodes[node]._in_edges.keys())
     
     def remove_node(self, nodeToRemove):
         '''Removes a node and all edges associated with it'''
-        # Get the edges connected to the node to be removed
+        # Get the edges connected to the node to be removed, including the incoming ones of a directed graph
         edges_to_remove = self._nodes[nodeToRemove].get_edges()
+        if self.directed:
+            edges_to_remove += list(self._nodes[nodeToRemove]._in_edges.values())
 
         # Remove the node from the list of nodes
         del self._nodes[nodeToRemove]
         
         # Remove the edges from the list of edges and from the adjacency lists of adjacent nodes
         for edge in edges_to_remove:
-            # Remove the edge from the graph's list of edges
-            del self._edges[edge]
+            # Remove the edge from the graph's count of edges
+            self._num_edges -= 1
             # Check which node of the edge is being removed
-            if edge.node1 != nodeToRemove:
+            if edge.node1.name != nodeToRemove:
                 # Remove the edge from the first node's list of edges if it's the second
                 del self._nodes[edge.node1.name]._edges[edge.node2.name]
             if edge.node2.name != nodeToRemove:
-                # Remove the edge from the first node's list of edges if it's the second
-                del self._nodes[edge.node2.name]._edges[edge.node1.name]
\ No newline at end of file
+                # Remove the edge from the second node's list of incoming edges if it's the first
+                del self._nodes[edge.node2.name]._in_edges[edge.node1.name]
+
+        removed_edges = [(edge.node2.name if edge.node1.name == nodeToRemove else edge.node1.name, edge.weight) for edge in edges_to_remove]
+        self._notify('remove_node', (nodeToRemove, removed_edges))
+
+
+def _format_weight(weight):
+    '''Returns a cost array as a plain list for printing, and any other weight as it is'''
+    return list(weight) if isinstance(weight, array) else weight
@@ -0,0 +1,219 @@
+from graph import Graph
+from compact_graph import CompactGraph
+from array import array
+import mmap
+import os
+import struct
+import sys
+import time
+
+# Binary edge records: two int64 node ids and a float64 weight,
+# optionally followed by the float64 (x, y) positions of both nodes
+EDGE_RECORD = struct.Struct('<qqd')
+EDGE_RECORD_WITH_POSITIONS = struct.Struct('<qqddddd')
+
+# Header of the persisted graph format: magic, version, flags, reserved,
+# number of nodes, number of CSR targets and number of bytes of string names
+GRAPH_HEADER = struct.Struct('<4sIIIQQQ')
+GRAPH_MAGIC = b'GRPH'
+GRAPH_VERSION = 1
+HAS_POSITIONS = 1
+STRING_NAMES = 2
+DIRECTED = 4
+
+# Delimiters used for the text formats, based on the file extension
+DELIMITERS = {
+    '.csv': ',',
+    '.tsv': '\t',
+}
+
+
+class LoadStats():
+    '''Counts and timing for one graph load'''
+
+    def __init__(self, edges, seconds):
+        '''Initialize the stats with the number of edges read and the time it took'''
+        self.edges = edges
+        self.seconds = seconds
+
+    @property
+    def edges_per_second(self):
+        '''Returns the load throughput'''
+        return self.edges / self.seconds if self.seconds > 0 else float('inf')
+
+    def __repr__(self):
+        '''Print the number of edges and the throughput'''
+        return f'{self.edges} edges in {self.seconds:.3f}s ({self.edges_per_second:,.0f} edges/s)'
+
+
+def _add_positions(graph, positions):
+    '''Attaches the 'pos' data of a chunk of (node, (x, y)) pairs'''
+    for name, pos in positions:
+        graph.get_node(name).add_data('pos', pos)
+
+
+def load_edge_list(path, graph=None, delimiter=None, node_type=str, chunk_size=65536):
+    '''Reads a CSV, TSV or whitespace separated edge list into a graph, chunk by chunk.
+    Each line is "node1 node2 weight", optionally followed by "x1 y1 x2 y2" positions of the two nodes.
+    Blank lines and lines starting with # are skipped. Returns the graph and the LoadStats of the load.'''
+    if graph is None:
+        graph = Graph()
+    if delimiter is None:
+        delimiter = DELIMITERS.get(os.path.splitext(path)[1].lower())
+
+    start = time.perf_counter()
+    count = 0
+    with open(path, 'r') as file:
+        while True:
+            # Read roughly chunk_size lines at a time to bound the memory used by a chunk
+            lines = file.readlines(chunk_size * 32)
+            if not lines:
+                break
+            edges = []
+            positions = []
+            for line in lines:
+                if not line.strip() or line.lstrip().startswith('#'):
+                    continue
+                fields = line.split(delimiter)
+                node1 = node_type(fields[0].strip())
+                node2 = node_type(fields[1].strip())
+                edges.append((node1, node2, float(fields[2])))
+                # Attach the positions in the same pass if the line has them
+                if len(fields) >= 7:
+                    positions.append((node1, (float(fields[3]), float(fields[4]))))
+                    positions.append((node2, (float(fields[5]), float(fields[6]))))
+            graph.add_edges_from(edges)
+            _add_positions(graph, positions)
+            count += len(edges)
+
+    return graph, LoadStats(count, time.perf_counter() - start)
+
+
+def load_binary_edges(path, graph=None, with_positions=False, chunk_size=65536):
+    '''Reads a binary edge file of fixed size records into a graph, chunk by chunk.
+    Returns the graph and the LoadStats of the load.'''
+    if graph is None:
+        graph = Graph()
+    record = EDGE_RECORD_WITH_POSITIONS if with_positions else EDGE_RECORD
+    # The record count is known up front from the file size
+    assert os.path.getsize(path) % record.size == 0, "File size is not a whole number of edge records"
+
+    start = time.perf_counter()
+    count = 0
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(record.size * chunk_size)
+            if not chunk:
+                break
+            values = list(record.iter_unpack(chunk))
+            graph.add_edges_from(value[:3] for value in values)
+            if with_positions:
+                _add_positions(graph, ((value[0], value[3:5]) for value in values))
+                _add_positions(graph, ((value[1], value[5:7]) for value in values))
+            count += len(values)
+
+    return graph, LoadStats(count, time.perf_counter() - start)
+
+
+def write_binary_edges(path, edges, positions=None):
+    '''Writes (node1, node2, weight) triples with integer node names to a binary edge file.
+    If a dictionary of node positions is given, each record also stores the positions of both nodes.'''
+    with open(path, 'wb') as file:
+        for node1, node2, weight in edges:
+            if positions is None:
+                file.write(EDGE_RECORD.pack(node1, node2, weight))
+            else:
+                file.write(EDGE_RECORD_WITH_POSITIONS.pack(node1, node2, weight, *positions[node1], *positions[node2]))
+
+
+class _StringTable():
+    '''Sequence of node names stored as UTF-8 bytes with an offset array, decoded one name at a time'''
+
+    def __init__(self, offsets, data):
+        '''Initialize the table from the name offsets and the UTF-8 bytes'''
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        '''Returns the number of names in the table'''
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        '''Decodes the name at a position in the table'''
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+    def __iter__(self):
+        '''Iterates over the decoded names'''
+        for index in range(len(self)):
+            yield self[index]
+
+
+def save_graph(graph, path):
+    '''Saves a Graph or CompactGraph in a binary format that load_graph can memory-map.
+    Node names must either all be integers or all be strings. A multi-criteria graph is saved with its
+    default cost, the first criterion.'''
+    assert sys.byteorder == 'little', "The graph format is little-endian"
+    if not isinstance(graph, CompactGraph):
+        graph = graph.freeze()
+    names = graph.nodes
+    flags = HAS_POSITIONS if graph.has_positions else 0
+    if graph.directed:
+        flags |= DIRECTED
+
+    # Encode the names as an integer array, or as UTF-8 bytes with an offset array
+    if all(isinstance(name, int) for name in names):
+        name_buffers = [array('q', names)]
+        names_length = 0
+    else:
+        assert all(isinstance(name, str) for name in names), "Node names must all be integers or all be strings"
+        flags |= STRING_NAMES
+        encoded = [name.encode('utf-8') for name in names]
+        name_offsets = array('q', [0])
+        for name in encoded:
+            name_offsets.append(name_offsets[-1] + len(name))
+        name_buffers = [name_offsets, b''.join(encoded)]
+        names_length = name_offsets[-1]
+
+    with open(path, 'wb') as file:
+        file.write(GRAPH_HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION, flags, 0, graph.num_nodes, len(graph._targets), names_length))
+        # Every section is made of 8 byte values, so the arrays stay aligned in the file
+        buffers = [graph._offsets, graph._targets, graph._weights]
+        if graph.has_positions:
+            buffers += [graph._x, graph._y]
+        for buffer in buffers + name_buffers:
+            file.write(bytes(buffer))
+
+
+def load_graph(path):
+    '''Opens a graph saved by save_graph as a CompactGraph backed by a read-only memory map.
+    Nothing is copied, so the file's pages are shared between all the processes that open it.'''
+    assert sys.byteorder == 'little', "The graph format is little-endian"
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, flags, _, num_nodes, num_targets, names_length = GRAPH_HEADER.unpack_from(mapped)
+    assert magic == GRAPH_MAGIC and version == GRAPH_VERSION, "File is not a saved graph"
+
+    view = memoryview(mapped)
+    position = GRAPH_HEADER.size
+
+    def section(length, typecode):
+        '''Returns a typed view of the next section of the file'''
+        nonlocal position
+        start = position
+        position += length * 8
+        return view[start:position].cast(typecode)
+
+    offsets = section(num_nodes + 1, 'q')
+    targets = section(num_targets, 'q')
+    weights = section(num_targets, 'd')
+    x = y = None
+    if flags & HAS_POSITIONS:
+        x = section(num_nodes, 'd')
+        y = section(num_nodes, 'd')
+    if flags & STRING_NAMES:
+        name_offsets = section(num_nodes + 1, 'q')
+        names = _StringTable(name_offsets, view[position:position + names_length])
+    else:
+        names = section(num_nodes, 'q')
+
+    return CompactGraph(names, offsets, targets, weights, x, y, bool(flags & DIRECTED))
@@ -1,6 +1,41 @@
 import unittest
+import asyncio
+import importlib.util
+import json
+import math
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 from graph import Graph
-from shortest_path import Dijkstra, A_Star
+import compact_graph
+from graph_io import load_edge_list, load_binary_edges, write_binary_edges, save_graph, load_graph
+from shortest_path import Dijkstra, A_Star, BidirectionalDijkstra, BidirectionalA_Star, distance_matrix, SearchCancelled
+from landmarks import Landmarks
+from contraction_hierarchy import ContractionHierarchy
+from dynamic_shortest_path import DynamicShortestPathTree
+from query_service import ShortestPathService
+from instrumentation import SearchStats
+import benchmark
+from batch_query import batch_shortest_paths
+from async_query import AsyncShortestPathService
+from minimum_spanning_tree import prim, kruskal, UnionFind
+from k_shortest_paths import k_shortest_paths
+from spatial_index import SpatialIndex
+from networkX_util import split_path_edges, get_edges_not_in_subgraph, thin_edges, draw_shortest_path_collections
+
+
+def query_graph():
+    '''Builds the five node graph shared by the query, service and instrumentation tests'''
+    graph = Graph()
+    graph.add_edges_from([('A', 'B', 5), ('B', 'C', 3), ('A', 'C', 9), ('C', 'D', 2), ('D', 'E', 4), ('E', 'A', 7)])
+    return graph
+
 
 class TestGraph(unittest.TestCase):
     def setUp(self):
@@ -55,6 +90,131 @@ class TestGraph(unittest.TestCase):
         self.assertTrue(self.graph.adjacent('A', 'B'))
         self.assertFalse(self.graph.adjacent('A', 'D'))
 
+    def test_neighbor_iterators(self):
+        # Check that the iterators and views match the list-returning methods
+        self.assertCountEqual(self.graph.iter_neighbors('A'), [('B', 1), ('C', 1), ('E', 1)])
+        self.assertCountEqual(self.graph.get_node('B').iter_edges(), self.graph.get_node('B').get_edges())
+        self.assertIn('C', self.graph.get_node('A').adjacent_names())
+        self.assertEqual(self.graph.get_node('D').degree, 0)
+        self.assertCountEqual(self.graph.iter_nodes(), self.graph.nodes)
+        self.assertCountEqual(self.graph.iter_edges(), self.graph.edges)
+
+    def test_update_edge_weight(self):
+        # Check that adding an existing edge updates its weight without adding a new edge
+        self.graph.add_edge('B', 'A', 4)
+        self.assertEqual(self.graph.num_edges, 5)
+        self.assertEqual(self.graph.get_edge('A', 'B').weight, 4)
+        self.assertEqual(self.graph.get_node('A').get_edges()[0].weight, 4)
+
+    def test_remove_node(self):
+        # Check that removing a node removes its edges from the graph and from its neighbors
+        self.graph.remove_node('A')
+        self.assertEqual(self.graph.num_nodes, 4)
+        self.assertEqual(self.graph.num_edges, 2)
+        self.assertCountEqual(self.graph.neighbors('B'), ['C', 'E'])
+
+    def test_nodes_are_hashable(self):
+        # Check that nodes hash by name and only create their data dictionary when it is used
+        node_a = self.graph.get_node('A')
+        self.assertEqual({node_a: 1}[Graph.Node('A')], 1)
+        self.assertIsNone(node_a._data)
+        node_a.add_data('pos', (0, 0))
+        self.assertEqual(node_a.get_data('pos'), (0, 0))
+        self.assertFalse(hasattr(node_a, '__dict__'))
+
+    def test_change_notifications(self):
+        # Check that every change increases the version and is passed to the listeners
+        events = []
+        self.graph.subscribe(lambda event, data: events.append((event, data)))
+        version = self.graph.version
+        self.graph.add_edge('A', 'D', 2)
+        self.graph.add_edge('A', 'D', 3)
+        self.graph.remove_node('D')
+        self.assertEqual(self.graph.version, version + 3)
+        self.assertEqual(events, [('add_edge', ('A', 'D', None, 2)),
+                                  ('add_edge', ('A', 'D', 2, 3)),
+                                  ('remove_node', ('D', [('A', 3)]))])
+
+    def test_memory_per_edge(self):
+        # Check that a graph with 30000 edges stays under 256 bytes per edge
+        tracemalloc.start()
+        graph = Graph()
+        for i in range(10000):
+            for k in (1, 2, 3):
+                graph.add_edge(i, (i + k) % 10000, k)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.assertLess(memory / graph.num_edges, 256)
+
+
+class TestGraphLoading(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_add_edges_from(self):
+        # Check that adding edges in bulk gives the same graph as adding them one by one
+        graph = Graph()
+        graph.add_edges_from([('A', 'B', 1), ('A', 'C', 2), ('B', 'A', 3)])
+        self.assertEqual(graph.num_nodes, 3)
+        self.assertEqual(graph.num_edges, 2)
+        self.assertEqual(graph.get_edge('A', 'B').weight, 3)
+
+    def test_load_edge_list(self):
+        # Check that a CSV edge list is loaded with its weights and positions
+        path = os.path.join(self.directory.name, 'edges.csv')
+        with open(path, 'w') as file:
+            file.write('# node1,node2,weight,x1,y1,x2,y2\n')
+            file.write('A,B,5,0,0,3,4\n')
+            file.write('B,C,3,3,4,6,0\n')
+        graph, stats = load_edge_list(path)
+        self.assertEqual(stats.edges, 2)
+        self.assertEqual(graph.num_edges, 2)
+        self.assertEqual(graph.get_edge('B', 'C').weight, 3)
+        self.assertEqual(graph.get_node('C').get_data('pos'), (6, 0))
+
+    def test_load_binary_edges(self):
+        # Check that a binary edge file round trips with its weights and positions
+        path = os.path.join(self.directory.name, 'edges.bin')
+        positions = {0: (0, 0), 1: (3, 4), 2: (6, 0)}
+        write_binary_edges(path, [(0, 1, 5), (1, 2, 3)], positions)
+        graph, stats = load_binary_edges(path, with_positions=True, chunk_size=1)
+        self.assertEqual(stats.edges, 2)
+        self.assertCountEqual(graph.neighbors(1), [0, 2])
+        self.assertEqual(graph.get_edge(0, 1).weight, 5)
+        self.assertEqual(graph.get_node(2).get_data('pos'), (6, 0))
+
+    def test_save_and_load_graph(self):
+        # Check that a saved graph can be memory-mapped and searched with the same results
+        graph = Graph()
+        graph.add_edges_from([('A', 'B', 5), ('B', 'C', 3), ('A', 'C', 9), ('C', 'D', 2)])
+        graph.add_edges_from([(1, 2, 1.5), (2, 3, 2)])
+        path = os.path.join(self.directory.name, 'graph.bin')
+        with self.assertRaises(AssertionError):
+            save_graph(graph, path)
+        graph.remove_node(1)
+        graph.remove_node(2)
+        graph.remove_node(3)
+        save_graph(graph, path)
+        loaded = load_graph(path)
+        self.assertCountEqual(loaded.nodes, ['A', 'B', 'C', 'D'])
+        self.assertEqual(loaded.num_edges, 4)
+        self.assertEqual(Dijkstra(loaded, 'A', 'D').shortest_path, ['A', 'B', 'C', 'D'])
+        self.assertEqual(Dijkstra(loaded, 'A', 'D').shortest_distance, 10)
+
+        # Integer names and positions are stored as arrays
+        graph = Graph()
+        graph.add_edges_from([(0, 1, 1), (1, 2, 1), (0, 2, 3)])
+        for name in range(3):
+            graph.get_node(name).add_data('pos', (name, 0))
+        save_graph(graph, path)
+        loaded = load_graph(path)
+        self.assertEqual(loaded.nodes, [0, 1, 2])
+        self.assertEqual(loaded.get_position(2), (2, 0))
+        self.assertEqual(A_Star(loaded, 0, 2).shortest_path, [0, 1, 2])
+
 
 class TestShortestPathAlgorithms(unittest.TestCase):
     
@@ -93,6 +253,16 @@ class TestShortestPathAlgorithms(unittest.TestCase):
         self.assertEqual(dijkstra.shortest_distance, 7)
         self.assertEqual(a_star.shortest_distance, 7)
 
+    def test_unreachable_end_node(self):
+        # Checks that the path to an unreachable node raises an assertion error and its distance is infinite
+        self.graph.add_node('F')
+        self.graph.get_node('F').add_data('pos', (15, 4))
+        for search in [Dijkstra(self.graph, 'A', 'F'), Dijkstra(self.graph, 'A', 'F', queue='list'),
+                       A_Star(self.graph, 'A', 'F'), Dijkstra(self.graph.freeze(), 'A', 'F')]:
+            self.assertEqual(search.shortest_distance, float('inf'))
+            with self.assertRaises(AssertionError):
+                search.shortest_path
+
     def test_heuristic_calculation(self):
         # Checks that the heuristic distance calculated between A and E is 12 
         a_star = A_Star(self.graph, 'A', 'E')
@@ -110,4 +280,812 @@ class TestShortestPathAlgorithms(unittest.TestCase):
         # Checks that the list of unvisited neighbors of A is B, C, and D.
         dijkstra = Dijkstra(self.graph, 'A', 'E')
         neighbors = dijkstra._get_unvisited_neighbors(self.graph.get_node('A'))
-        self.assertEqual(neighbors, {'B', 'C', 'E'})
\ No newline at end of file
+        self.assertEqual(neighbors, {'B', 'C', 'E'})
+
+    def test_priority_queue_backends(self):
+        # Checks that the heap and list priority queues find the same paths and distances
+        for queue in ['heap', 'list']:
+            dijkstra = Dijkstra(self.graph, 'B', 'E', queue=queue)
+            a_star = A_Star(self.graph, 'B', 'E', queue=queue)
+            self.assertEqual(dijkstra.shortest_path, ['B', 'C', 'D', 'E'])
+            self.assertEqual(a_star.shortest_path, ['B', 'C', 'D', 'E'])
+            self.assertEqual(Dijkstra(self.graph, 'B', 'E', queue=queue).shortest_distance, 9)
+
+    def test_heap_queue_skips_stale_entries(self):
+        # Checks that an updated entry replaces the old one and the old copy is never returned
+        dijkstra = Dijkstra(self.graph, 'A', 'E')
+        queue = dijkstra._priority_queue
+        node_c = self.graph.get_node('C')
+        queue.update((node_c, 4, self.graph.get_node('B')))
+        self.assertEqual(queue.pop()[0].name, 'A')
+        self.assertEqual(queue.pop(), (node_c, 4, self.graph.get_node('B')))
+        self.assertEqual(len(queue), 3)
+
+    def test_search_stops_at_end_node(self):
+        # Checks that the search stops once the end node is settled and that both results come from one search
+        dijkstra = Dijkstra(self.graph, 'A', 'B')
+        self.assertEqual(dijkstra.shortest_distance, 5)
+        self.assertNotIn('D', dijkstra._visited)
+        settled = len(dijkstra._visited)
+        self.assertEqual(dijkstra.shortest_path, ['A', 'B'])
+        self.assertEqual(dijkstra.shortest_distance, 5)
+        self.assertEqual(len(dijkstra._visited), settled)
+
+    def test_shortest_path_tree(self):
+        # Checks that one search from A gives the distances and paths to every other node
+        tree = Dijkstra(self.graph, 'A').shortest_path_tree()
+        self.assertEqual(tree.distances, {'A': 0, 'B': 5, 'C': 8, 'D': 10, 'E': 7})
+        self.assertEqual(tree.path_to('D'), ['A', 'B', 'C', 'D'])
+        self.assertEqual(tree.path_to('A'), ['A'])
+        self.graph.add_node('F')
+        tree = Dijkstra(self.graph, 'A').shortest_path_tree()
+        self.assertFalse(tree.is_reachable('F'))
+        self.assertEqual(tree.distance_to('F'), float('inf'))
+
+    def test_distance_matrix(self):
+        # Checks that the distance matrix is the same whether it runs in this process or in a process pool
+        expected = [[0, 10, 7], [10, 0, 4]]
+        self.assertEqual(distance_matrix(self.graph, ['A', 'D'], ['A', 'D', 'E'], max_workers=1), expected)
+        self.assertEqual(distance_matrix(self.graph, ['A', 'D'], ['A', 'D', 'E'], max_workers=2), expected)
+
+    def test_compact_graph_search(self):
+        # Checks that searching the frozen graph gives the same results as searching the graph
+        compact_graph = self.graph.freeze()
+        self.assertEqual(compact_graph.num_nodes, 5)
+        self.assertEqual(compact_graph.num_edges, 6)
+        self.assertCountEqual(compact_graph.neighbors('A'), ['B', 'C', 'E'])
+        for start, end in [('A', 'E'), ('B', 'E'), ('E', 'B'), ('C', 'C')]:
+            for algorithm in [Dijkstra, A_Star]:
+                expected = algorithm(self.graph, start, end)
+                result = algorithm(compact_graph, start, end)
+                self.assertEqual(result.shortest_path, expected.shortest_path)
+                self.assertEqual(result.shortest_distance, expected.shortest_distance)
+        tree = Dijkstra(compact_graph, 'A').shortest_path_tree()
+        self.assertEqual(tree.distances, Dijkstra(self.graph, 'A').shortest_path_tree().distances)
+
+
+class TestShortestPathService(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = query_graph()
+
+    def test_cache_hits(self):
+        # Checks that a repeated query is answered from the cache
+        service = ShortestPathService(self.graph)
+        self.assertEqual(service.query('A', 'D'), (['A', 'B', 'C', 'D'], 10))
+        self.assertEqual(service.query('A', 'D'), (['A', 'B', 'C', 'D'], 10))
+        self.assertEqual(service.stats['hits'], 1)
+        self.assertEqual(service.stats['misses'], 1)
+        self.assertGreater(service.stats['bytes'], 0)
+
+    def test_invalidated_by_changes(self):
+        # Checks that cached results are dropped when the graph changes
+        service = ShortestPathService(self.graph)
+        self.assertEqual(service.shortest_distance('A', 'D'), 10)
+        self.graph.add_edge('A', 'D', 1)
+        self.assertEqual(service.shortest_distance('A', 'D'), 1)
+        self.graph.add_node('F')
+        self.assertIsNone(service.shortest_path('A', 'F'))
+        self.assertEqual(service.stats['invalidations'], 2)
+
+    def test_lru_eviction(self):
+        # Checks that the least recently used result is evicted first
+        service = ShortestPathService(self.graph, max_entries=2)
+        service.query('A', 'B')
+        service.query('A', 'C')
+        service.query('A', 'B')
+        service.query('A', 'D')
+        self.assertEqual(service.stats['evictions'], 1)
+        service.query('A', 'B')
+        self.assertEqual(service.stats['hits'], 2)
+        service = ShortestPathService(self.graph, max_bytes=1)
+        service.query('A', 'B')
+        self.assertEqual(service.stats['entries'], 0)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = query_graph()
+
+    def test_disabled_by_default(self):
+        # Checks that a search without instrumentation has no stats
+        self.assertIsNone(Dijkstra(self.graph, 'A', 'D').stats)
+
+    def test_counters(self):
+        # Checks the counters of a search from A to D on both graph representations
+        for graph in [self.graph, self.graph.freeze()]:
+            dijkstra = Dijkstra(graph, 'A', 'D', instrument=True)
+            dijkstra.shortest_path
+            stats = dijkstra.stats
+            self.assertEqual(stats.nodes_settled, 5)
+            self.assertEqual(stats.edges_relaxed, 12)
+            # C is first reached through A and then improved through B, and D through E and then C
+            self.assertEqual(stats.decrease_keys, 2)
+            self.assertIn('search', stats.timings)
+            self.assertIn('path', stats.timings)
+
+    def test_callback_and_json(self):
+        # Checks that the callback gets the stats once the search ends and that they export to JSON
+        collected = []
+        for name in 'ABCDE':
+            self.graph.get_node(name).add_data('pos', (0, 0))
+        A_Star(self.graph, 'B', 'E', instrument=collected.append).shortest_distance
+        self.assertEqual(len(collected), 1)
+        exported = json.loads(collected[0].to_json())
+        self.assertEqual(exported['algorithm'], 'A_Star')
+        self.assertEqual((exported['start_node'], exported['end_node']), ('B', 'E'))
+        stats = SearchStats(timings=False)
+        BidirectionalDijkstra(self.graph, 'A', 'D', instrument=stats).shortest_distance
+        self.assertEqual(stats.timings, {})
+        self.assertGreater(stats.nodes_settled, 0)
+
+    def test_engines_report_same_counters(self):
+        # Checks that a Graph and its CompactGraph report the same counters, and that nodes which are never
+        # reached are not counted as pushes
+        rng = random.Random(5)
+        graph = Graph()
+        for node in range(1, 105):
+            graph.add_edge(node, rng.randrange(node), rng.randint(1, 9))
+        for _ in range(150):
+            graph.add_edge(*rng.sample(range(105), 2), rng.randint(1, 9))
+        results = []
+        for searched in [graph, graph.freeze()]:
+            dijkstra = Dijkstra(searched, 0, 77, instrument=True)
+            dijkstra.shortest_path
+            stats = dijkstra.stats
+            results.append((stats.nodes_settled, stats.edges_relaxed, stats.queue_pushes, stats.decrease_keys))
+        self.assertEqual(results[0], results[1])
+        self.assertLess(results[0][2], graph.num_nodes)
+        # Searches without instrumentation do not count anything
+        dijkstra = Dijkstra(graph, 0, 77)
+        dijkstra.shortest_path
+        self.assertEqual(dijkstra._priority_queue.pushes, 0)
+
+    def test_bidirectional_directed_counters(self):
+        # Checks that the backward search of a directed graph counts the edges into the nodes it settles
+        graph = Graph(directed=True)
+        graph.add_edges_from([('A', 'B', 1), ('B', 'C', 1), ('C', 'D', 1), ('A', 'X', 1), ('A', 'Y', 1), ('A', 'Z', 1), ('Q', 'D', 1)])
+        search = BidirectionalDijkstra(graph, 'A', 'D', instrument=True)
+        search.shortest_distance
+        forward, backward = search._settled_sides
+        expected = (sum(len(graph.get_node(name)._edges) for name in forward) +
+                    sum(len(graph.get_node(name)._in_edges) for name in backward))
+        self.assertEqual(search.stats.edges_relaxed, expected)
+        self.assertIn('D', backward)
+        self.assertEqual(expected, 7)
+
+    def test_callback_once_per_search(self):
+        # Checks that reading both results of a search, directly or through the service, reports its stats once
+        collected = []
+        dijkstra = Dijkstra(self.graph, 'A', 'D', instrument=collected.append)
+        dijkstra.shortest_distance
+        dijkstra.shortest_path
+        self.assertEqual(len(collected), 1)
+        service = ShortestPathService(self.graph, instrument=collected.append)
+        service.query('B', 'E')
+        self.assertEqual(len(collected), 2)
+
+
+class TestBatchQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = query_graph()
+        self.graph.add_node('F')
+        self.pairs = [('A', 'D'), ('B', 'E'), ('A', 'E'), ('A', 'F'), ('C', 'C')]
+
+    def test_in_input_order(self):
+        # Checks that batch results match single queries and come back in input order, in and out of process
+        expected = [('A', 'D', ['A', 'B', 'C', 'D'], 10), ('B', 'E', ['B', 'C', 'D', 'E'], 9),
+                    ('A', 'E', ['A', 'E'], 7), ('A', 'F', None, float('inf')), ('C', 'C', ['C'], 0)]
+        self.assertEqual(list(batch_shortest_paths(self.graph, self.pairs, max_workers=1)), expected)
+        self.assertEqual(list(batch_shortest_paths(self.graph, self.pairs, max_workers=2)), expected)
+
+    def test_completion_order(self):
+        # Checks that unordered results contain every query exactly once
+        results = list(batch_shortest_paths(self.graph, self.pairs, max_workers=2, ordered=False))
+        self.assertCountEqual([(start, end) for start, end, _, _ in results], self.pairs)
+
+    def test_tuple_names(self):
+        # Checks that graphs save_graph cannot write, such as ones named by (x, y) tuples, are still answered
+        graph = Graph()
+        graph.add_edges_from([((0, 0), (0, 1), 2), ((0, 1), (1, 1), 3), ((0, 0), (1, 0), 4), ((1, 0), (1, 1), 2)])
+        graph.add_node((2, 2))
+        pairs = [((0, 0), (1, 1)), ((1, 1), (0, 1)), ((0, 0), (2, 2))]
+        expected = [((0, 0), (1, 1), [(0, 0), (0, 1), (1, 1)], 5), ((1, 1), (0, 1), [(1, 1), (0, 1)], 3),
+                    ((0, 0), (2, 2), None, float('inf'))]
+        self.assertEqual(list(batch_shortest_paths(graph, pairs, max_workers=1)), expected)
+        self.assertEqual(list(batch_shortest_paths(graph, pairs, max_workers=2)), expected)
+
+
+class TestAsyncQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = query_graph()
+        self.graph.add_node('F')
+
+    def test_matches_dijkstra(self):
+        # Checks that awaited results match a blocking search, including an unreachable node
+        async def run():
+            async with AsyncShortestPathService(self.graph, max_workers=2) as service:
+                return await asyncio.gather(service.query('A', 'D'), service.query('A', 'F'))
+        self.assertEqual(asyncio.run(run()), [(['A', 'B', 'C', 'D'], 10), (None, float('inf'))])
+
+    def test_coalescing(self):
+        # Checks that concurrent identical queries share a single search
+        async def run():
+            async with AsyncShortestPathService(self.graph) as service:
+                results = await asyncio.gather(*[service.query('B', 'E') for _ in range(5)])
+                return results, service.stats
+        results, stats = asyncio.run(run())
+        self.assertEqual(results, [(['B', 'C', 'D', 'E'], 9)] * 5)
+        self.assertEqual(stats['searches'], 1)
+        self.assertEqual(stats['coalesced'], 4)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_timeout_cancels_search(self):
+        # Checks that a query that times out raises and stops the search it was waiting for
+        started = threading.Event()
+        release = threading.Event()
+
+        class SlowDijkstra(Dijkstra):
+            def __init__(self, *args, **kwargs):
+                started.set()
+                release.wait(5)
+                super().__init__(*args, **kwargs)
+
+        async def run():
+            async with AsyncShortestPathService(self.graph, algorithm=SlowDijkstra) as service:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await service.query('A', 'E', timeout=0.05)
+                self.assertTrue(started.is_set())
+                release.set()
+                return service.stats
+        stats = asyncio.run(run())
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['cancelled'], 1)
+
+    def test_close_does_not_block_loop(self):
+        # Checks that closing the service waits for a running search without blocking the event loop
+        started = threading.Event()
+        release = threading.Event()
+
+        class SlowDijkstra(Dijkstra):
+            def __init__(self, *args, **kwargs):
+                started.set()
+                release.wait(5)
+                super().__init__(*args, **kwargs)
+
+        async def release_soon():
+            await asyncio.sleep(0.05)
+            release.set()
+
+        async def run():
+            service = AsyncShortestPathService(self.graph, algorithm=SlowDijkstra)
+            query = asyncio.ensure_future(service.query('A', 'E'))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            releaser = asyncio.ensure_future(release_soon())
+            close_start = time.perf_counter()
+            # The search can only finish once the loop has run release_soon
+            await service.aclose()
+            elapsed = time.perf_counter() - close_start
+            await releaser
+            await asyncio.gather(query, return_exceptions=True)
+            return elapsed
+        self.assertLess(asyncio.run(run()), 2)
+
+    def test_thread_executor_only(self):
+        # Checks that executors whose workers cannot share a cancel event are refused
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=1)
+        try:
+            with self.assertRaises(AssertionError):
+                AsyncShortestPathService(self.graph, executor=executor)
+        finally:
+            executor.shutdown()
+
+    def test_cancel_event(self):
+        # Checks that a search stops when its cancel event is set
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(SearchCancelled):
+            Dijkstra(self.graph, 'A', 'E', cancel=cancel).shortest_distance
+        with self.assertRaises(SearchCancelled):
+            Dijkstra(self.graph.freeze(), 'A', 'E', cancel=cancel).shortest_distance
+        with self.assertRaises(SearchCancelled):
+            BidirectionalDijkstra(self.graph, 'A', 'E', cancel=cancel).shortest_distance
+
+
+class TestBidirectionalSearch(unittest.TestCase):
+
+    def setUp(self):
+        # Construct a 15 x 15 grid with diagonal shortcuts, where every edge weight is at least its straight line length
+        self.rng = random.Random(8)
+        self.graph = Graph()
+        for x in range(15):
+            for y in range(15):
+                self.graph.add_node((x, y)).add_data('pos', (x, y))
+        for x in range(15):
+            for y in range(15):
+                if x < 14:
+                    self.graph.add_edge((x, y), (x + 1, y), self.rng.randint(1, 4))
+                if y < 14:
+                    self.graph.add_edge((x, y), (x, y + 1), self.rng.randint(1, 4))
+                if x < 14 and y < 14 and self.rng.random() < 0.3:
+                    self.graph.add_edge((x, y), (x + 1, y + 1), self.rng.randint(2, 5))
+
+    def test_matches_dijkstra(self):
+        # Checks that both bidirectional searches find paths as short as Dijkstra on random queries
+        nodes = self.graph.nodes
+        for _ in range(30):
+            start, end = self.rng.choice(nodes), self.rng.choice(nodes)
+            expected = Dijkstra(self.graph, start, end).shortest_distance
+            for algorithm in [BidirectionalDijkstra, BidirectionalA_Star]:
+                search = algorithm(self.graph, start, end)
+                path = search.shortest_path
+                self.assertEqual(search.shortest_distance, expected)
+                self.assertEqual(path[0], start)
+                self.assertEqual(path[-1], end)
+                self.assertEqual(sum(self.graph.get_edge(a, b).weight for a, b in zip(path, path[1:])), expected)
+
+    def test_settles_fewer_nodes(self):
+        # Checks that meeting in the middle settles fewer nodes than a forward search
+        dijkstra = Dijkstra(self.graph, (0, 0), (14, 14))
+        bidirectional = BidirectionalDijkstra(self.graph, (0, 0), (14, 14))
+        self.assertEqual(dijkstra.shortest_distance, bidirectional.shortest_distance)
+        self.assertLess(bidirectional.num_settled, dijkstra.num_settled)
+
+    def test_same_start_and_end(self):
+        # Checks that a query from a node to itself has an empty path
+        search = BidirectionalDijkstra(self.graph, (3, 3), (3, 3))
+        self.assertEqual(search.shortest_path, [(3, 3)])
+        self.assertEqual(search.shortest_distance, 0)
+
+
+class TestLandmarks(unittest.TestCase):
+
+    def setUp(self):
+        # Construct a random connected graph without any 'pos' data
+        self.rng = random.Random(9)
+        self.graph = Graph()
+        for node in range(1, 200):
+            self.graph.add_edge(node, self.rng.randrange(node), self.rng.randint(1, 10))
+        for _ in range(300):
+            node1, node2 = self.rng.sample(range(200), 2)
+            self.graph.add_edge(node1, node2, self.rng.randint(1, 10))
+        self.landmarks = Landmarks.build(self.graph, k=4, seed=1)
+
+    def test_lower_bound_is_admissible(self):
+        # Checks that the landmark bound never overestimates the shortest distance
+        tree = Dijkstra(self.graph, 0).shortest_path_tree()
+        for node in self.graph.nodes:
+            self.assertLessEqual(self.landmarks.lower_bound(node, 0), tree.distance_to(node))
+        self.assertEqual(len(self.landmarks.landmarks), 4)
+
+    def test_a_star_with_landmarks(self):
+        # Checks that A* with landmarks matches Dijkstra on random queries, on both graph representations
+        compact_graph = self.graph.freeze()
+        for _ in range(20):
+            start, end = self.rng.sample(range(200), 2)
+            expected = Dijkstra(self.graph, start, end).shortest_distance
+            self.assertEqual(A_Star(self.graph, start, end, landmarks=self.landmarks).shortest_distance, expected)
+            self.assertEqual(A_Star(compact_graph, start, end, landmarks=self.landmarks).shortest_distance, expected)
+
+    def test_save_and_load(self):
+        # Checks that saved landmark tables give the same bounds after loading
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'landmarks.bin')
+            self.landmarks.save(path)
+            loaded = Landmarks.load(path, self.graph)
+        self.assertEqual(loaded.landmarks, self.landmarks.landmarks)
+        self.assertEqual(loaded.lower_bound(5, 17), self.landmarks.lower_bound(5, 17))
+
+
+class TestContractionHierarchy(unittest.TestCase):
+
+    def setUp(self):
+        # Construct a random connected graph with string node names
+        self.rng = random.Random(10)
+        self.graph = Graph()
+        for node in range(1, 150):
+            self.graph.add_edge(str(node), str(self.rng.randrange(node)), self.rng.randint(1, 10))
+        for _ in range(250):
+            node1, node2 = self.rng.sample(range(150), 2)
+            self.graph.add_edge(str(node1), str(node2), self.rng.randint(1, 10))
+        self.graph.add_node('isolated')
+        self.hierarchy = ContractionHierarchy.build(self.graph)
+
+    def test_matches_dijkstra(self):
+        # Checks that hierarchy queries match Dijkstra on random queries and unpack to original edges
+        nodes = self.graph.nodes
+        for _ in range(50):
+            start, end = self.rng.choice(nodes[:-1]), self.rng.choice(nodes[:-1])
+            query = self.hierarchy.query(start, end)
+            expected = Dijkstra(self.graph, start, end).shortest_distance
+            self.assertEqual(query.shortest_distance, expected)
+            path = query.shortest_path
+            self.assertEqual((path[0], path[-1]), (start, end))
+            self.assertEqual(sum(self.graph.get_edge(a, b).weight for a, b in zip(path, path[1:])), expected)
+
+    def test_unreachable_and_same_node(self):
+        # Checks queries to an unreachable node and from a node to itself
+        self.assertEqual(self.hierarchy.query('0', 'isolated').shortest_distance, float('inf'))
+        self.assertEqual(self.hierarchy.query('5', '5').shortest_path, ['5'])
+        self.assertEqual(self.hierarchy.query('5', '5').shortest_distance, 0)
+
+
+class TestDynamicShortestPathTree(unittest.TestCase):
+
+    def setUp(self):
+        # Construct a random connected graph
+        self.rng = random.Random(11)
+        self.graph = Graph()
+        for node in range(1, 120):
+            self.graph.add_edge(node, self.rng.randrange(node), self.rng.randint(1, 10))
+        for _ in range(200):
+            node1, node2 = self.rng.sample(range(120), 2)
+            self.graph.add_edge(node1, node2, self.rng.randint(1, 10))
+
+    def assertTreeIsCorrect(self, tree):
+        # The repaired distances must match a tree computed from scratch
+        self.assertTrue(tree.is_current)
+        self.assertEqual(tree.distances, Dijkstra(self.graph, tree.source).shortest_path_tree().distances)
+        for node in tree.distances:
+            path = tree.path_to(node)
+            self.assertEqual(sum(self.graph.get_edge(a, b).weight for a, b in zip(path, path[1:])), tree.distance_to(node))
+
+    def test_weight_changes(self):
+        # Checks that the tree stays correct after random weight increases and decreases
+        tree = DynamicShortestPathTree(self.graph, 0)
+        for _ in range(40):
+            edge = self.rng.choice(self.graph.edges)
+            self.graph.add_edge(edge.node1.name, edge.node2.name, self.rng.randint(1, 10))
+            self.assertTreeIsCorrect(tree)
+        self.assertLess(tree.num_repaired, self.graph.num_nodes)
+
+    def test_node_removal(self):
+        # Checks that the tree stays correct after nodes are removed, including disconnecting ones
+        tree = DynamicShortestPathTree(self.graph, 0)
+        for node in self.rng.sample(range(1, 120), 30):
+            self.graph.remove_node(node)
+            self.assertTreeIsCorrect(tree)
+        self.graph.add_edge(0, 'new', 1)
+        self.assertTreeIsCorrect(tree)
+        tree.close()
+        self.graph.add_edge(0, 'other', 1)
+        self.assertFalse(tree.is_current)
+
+    def test_search_is_stale(self):
+        # Checks that a search notices when the graph has changed since it was created
+        dijkstra = Dijkstra(self.graph, 0, 5)
+        self.assertFalse(dijkstra.is_stale)
+        self.graph.add_edge(0, 5, 1)
+        self.assertTrue(dijkstra.is_stale)
+
+
+class TestKShortestPaths(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = Graph()
+        self.graph.add_edges_from([('A', 'B', 3), ('A', 'C', 2), ('B', 'C', 1), ('B', 'D', 4), ('C', 'D', 2),
+                                   ('C', 'E', 3), ('D', 'E', 2), ('D', 'F', 1), ('E', 'F', 2)])
+
+    def all_simple_paths(self, graph, start, end):
+        # Lists the distance of every loopless path with a depth first search
+        distances = []
+        def extend(path, distance):
+            if path[-1] == end:
+                distances.append(distance)
+                return
+            for neighbor, weight in graph.iter_neighbors(path[-1]):
+                if neighbor not in path:
+                    extend(path + [neighbor], distance + weight)
+        extend([start], 0)
+        return sorted(distances)
+
+    def test_small_graph(self):
+        # Checks the paths are loopless, distinct, correctly measured and as short as the brute force ones
+        paths = k_shortest_paths(self.graph, 'A', 'F', 5)
+        self.assertEqual(paths[0], (['A', 'C', 'D', 'F'], 5))
+        self.assertEqual([distance for _, distance in paths], self.all_simple_paths(self.graph, 'A', 'F')[:5])
+        self.assertEqual(len({tuple(path) for path, _ in paths}), 5)
+        for path, distance in paths:
+            self.assertEqual(len(set(path)), len(path))
+            self.assertEqual(sum(self.graph.get_edge(a, b).weight for a, b in zip(path, path[1:])), distance)
+
+    def test_random_graphs(self):
+        # Checks the distances against brute force on small random graphs, without changing the graph
+        for seed in range(3):
+            graph = Graph()
+            graph.add_edges_from(benchmark.dense_edges(9, density=0.4, seed=seed)[0])
+            version = graph.version
+            expected = self.all_simple_paths(graph, 0, 8)[:6]
+            self.assertEqual([distance for _, distance in k_shortest_paths(graph, 0, 8, 6)], expected)
+            self.assertEqual(graph.version, version)
+
+    def test_fewer_paths(self):
+        # Checks the edge cases of unreachable nodes, equal start and end nodes and too few paths
+        self.graph.add_node('G')
+        self.assertEqual(k_shortest_paths(self.graph, 'A', 'G', 3), [])
+        self.assertEqual(k_shortest_paths(self.graph, 'A', 'A', 3), [(['A'], 0)])
+        self.graph.add_edge('G', 'H', 1)
+        self.assertEqual(k_shortest_paths(self.graph, 'G', 'H', 3), [(['G', 'H'], 1)])
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        edges, self.positions = benchmark.random_geometric_edges(300, seed=4)
+        self.graph = benchmark.build_graph(edges, self.positions)[0]
+        self.index = SpatialIndex(self.graph)
+        rng = random.Random(5)
+        self.points = [(rng.uniform(-3, 20), rng.uniform(-3, 20)) for _ in range(50)]
+
+    def closest(self, x, y):
+        # Finds the distances to every node with a linear scan
+        return sorted(math.hypot(pos[0] - x, pos[1] - y) for pos in self.positions.values())
+
+    def test_nearest_and_within(self):
+        # Checks nearest-k and radius queries against a linear scan
+        for x, y in self.points:
+            self.assertEqual([distance for _, distance in self.index.nearest(x, y, 3)], self.closest(x, y)[:3])
+            self.assertEqual([distance for _, distance in self.index.within(x, y, 1.5)],
+                             [distance for distance in self.closest(x, y) if distance <= 1.5])
+
+    def test_far_outside(self):
+        # Checks that points far outside the nodes are answered quickly and correctly
+        for x, y in [(1000, 1000), (-3000, 5), (8, 1e6)]:
+            start = time.perf_counter()
+            self.assertEqual([distance for _, distance in self.index.nearest(x, y, 2)], self.closest(x, y)[:2])
+            self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_cell_size_follows_growth(self):
+        # Checks that an index built on an empty graph picks a cell size for the coordinates added later
+        graph = Graph()
+        index = SpatialIndex(graph)
+        for name, pos in self.positions.items():
+            graph.add_node(name).add_data('pos', (pos[0] * 1000, pos[1] * 1000))
+        self.assertEqual(index.snap(5000, 5000), self.index.snap(5, 5))
+        self.assertGreater(index.cell_size, 100)
+
+    def test_snap_many(self):
+        # Checks that batch snapping matches snapping one point at a time
+        self.assertEqual(self.index.snap_many(self.points), [self.index.snap(x, y) for x, y in self.points])
+
+    def test_follows_graph_changes(self):
+        # Checks that added and removed nodes are picked up without rebuilding the index
+        self.graph.add_node('new').add_data('pos', (100, 100))
+        self.assertEqual(self.index.snap(99, 99), 'new')
+        self.graph.remove_node('new')
+        self.graph.remove_node(self.index.snap(5, 5))
+        self.assertEqual(len(self.index), 299)
+        self.assertNotIn('new', [name for name, _ in self.index.nearest(99, 99, 5)])
+        self.index.close()
+
+
+class TestDirectedAndMultiCriteria(unittest.TestCase):
+
+    def setUp(self):
+        # One-way streets: the direct edge from A to D can only be used from D to A
+        self.directed = Graph(directed=True)
+        self.directed.add_edges_from([('A', 'B', 1), ('B', 'C', 1), ('C', 'D', 1), ('D', 'A', 1), ('B', 'D', 5)])
+        # Every edge has a (time, distance, toll) cost vector
+        self.roads = Graph(criteria=('time', 'distance', 'toll'))
+        self.roads.add_edge('A', 'B', (10, 5, 0))
+        self.roads.add_edge('B', 'D', (10, 5, 0))
+        self.roads.add_edge('A', 'C', (4, 8, 3))
+        self.roads.add_edge('C', 'D', (4, 8, 3))
+
+    def test_directed_graph(self):
+        # Checks that directed edges keep separate outgoing and incoming adjacency
+        self.assertEqual(self.directed.num_edges, 5)
+        self.assertTrue(self.directed.adjacent('D', 'A'))
+        self.assertFalse(self.directed.adjacent('A', 'D'))
+        self.assertCountEqual(self.directed.neighbors('B'), ['C', 'D'])
+        self.assertCountEqual(self.directed.predecessors('D'), ['B', 'C'])
+        self.assertEqual(str(self.directed.get_edge('A', 'B')), 'A -> B: 1')
+        self.directed.remove_node('D')
+        self.assertEqual(self.directed.num_edges, 2)
+        self.assertEqual(self.directed.predecessors('A'), [])
+
+    def test_directed_search(self):
+        # Checks that every engine follows the edges in their direction only
+        for graph in [self.directed, self.directed.freeze()]:
+            self.assertEqual(Dijkstra(graph, 'A', 'D').shortest_path, ['A', 'B', 'C', 'D'])
+            self.assertEqual(Dijkstra(graph, 'D', 'A').shortest_distance, 1)
+        self.assertEqual(self.directed.freeze().num_edges, 5)
+        self.assertEqual(BidirectionalDijkstra(self.directed, 'A', 'D').shortest_path, ['A', 'B', 'C', 'D'])
+        self.assertEqual(BidirectionalDijkstra(self.directed, 'C', 'B').shortest_distance, 3)
+
+    def test_cost_profiles(self):
+        # Checks that a criterion, a weighted sum or a function of the costs picks the route on every engine
+        for graph in [self.roads, self.roads.freeze()]:
+            self.assertEqual(Dijkstra(graph, 'A', 'D', weight='time').shortest_path, ['A', 'C', 'D'])
+            self.assertEqual(Dijkstra(graph, 'A', 'D', weight='distance').shortest_path, ['A', 'B', 'D'])
+            self.assertEqual(Dijkstra(graph, 'A', 'D', weight={'time': 1, 'toll': 3}).shortest_distance, 20)
+            self.assertEqual(Dijkstra(graph, 'A', 'D', weight=lambda costs: costs[0] + costs[2]).shortest_distance, 14)
+        self.assertEqual(BidirectionalDijkstra(self.roads, 'A', 'D', weight='toll').shortest_distance, 0)
+        self.assertEqual(str(self.roads.get_edge('A', 'C')), 'A - C: [4.0, 8.0, 3.0]')
+        with self.assertRaises(AssertionError):
+            self.roads.add_edge('A', 'D', (1, 2))
+
+    def test_cost_array_cache(self):
+        # Checks that functions are not cached and weighted sums only up to a limit
+        compact = self.roads.freeze()
+        for factor in range(20):
+            Dijkstra(compact, 'A', 'D', weight=lambda costs: costs[0] + costs[2]).shortest_distance
+            Dijkstra(compact, 'A', 'D', weight={'time': 1, 'toll': factor}).shortest_distance
+            Dijkstra(compact, 'A', 'D', weight='time').shortest_distance
+        self.assertEqual(len(compact._cost_arrays), compact_graph.MAX_COST_ARRAYS)
+
+    def test_save_and_pickle(self):
+        # Checks that the direction and the criteria survive saving and pickling
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'directed.bin')
+            save_graph(self.directed, path)
+            loaded = load_graph(path)
+            self.assertTrue(loaded.directed)
+            self.assertEqual(Dijkstra(loaded, 'A', 'D').shortest_distance, 3)
+        copy = pickle.loads(pickle.dumps(self.roads))
+        self.assertEqual(copy.criteria, ('time', 'distance', 'toll'))
+        self.assertEqual(list(copy.get_edge('A', 'C').weight), [4, 8, 3])
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_import_budget(self):
+        # Checks in a fresh interpreter that importing shortest_path stays fast and leaves out the optional packages
+        code = ("import sys, time\n"
+                "start = time.perf_counter()\n"
+                "import shortest_path, networkX_util\n"
+                "print(time.perf_counter() - start)\n"
+                "print(','.join(name for name in ('tabulate', 'networkx', 'matplotlib', 'numpy', 'multiprocessing') if name in sys.modules))\n")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split('\n')
+        self.assertLess(float(output[0]), 0.5)
+        self.assertEqual(output[1], '')
+
+
+class TestNetworkXUtil(unittest.TestCase):
+
+    class EdgeList():
+        '''Stand-in for a networkx graph that only has the edges and is_directed methods'''
+
+        def __init__(self, edges, directed=False):
+            self._edges = edges
+            self._directed = directed
+
+        def edges(self):
+            return list(self._edges)
+
+        def is_directed(self):
+            return self._directed
+
+    def setUp(self):
+        self.edges = [('A', 'B'), ('C', 'B'), ('A', 'C'), ('C', 'D'), ('E', 'D'), ('A', 'E'), ('B', 'E')]
+        self.path = ['A', 'B', 'C', 'D']
+        self.pos = {'A': (0, 0), 'B': (1, 0), 'C': (1, 1), 'D': (2, 1), 'E': (0, 2)}
+
+    def test_split_path_edges(self):
+        # Checks that path edges are found in either direction and that every edge lands on exactly one side
+        on_path, off_path = split_path_edges(self.edges, self.path)
+        self.assertEqual(on_path, [('A', 'B'), ('C', 'B'), ('C', 'D')])
+        self.assertEqual(off_path, [('A', 'C'), ('E', 'D'), ('A', 'E'), ('B', 'E')])
+        self.assertFalse(set(on_path) & set(off_path))
+        self.assertCountEqual(on_path + off_path, self.edges)
+
+    def test_edges_not_in_subgraph(self):
+        # Checks that subgraph edges are skipped in either direction, with plain lists and with graph-like objects
+        subgraph = self.EdgeList([('B', 'A'), ('B', 'C'), ('D', 'C')])
+        expected = [('A', 'C'), ('E', 'D'), ('A', 'E'), ('B', 'E')]
+        self.assertEqual(get_edges_not_in_subgraph(self.EdgeList(self.edges), subgraph), expected)
+        on_path, off_path = split_path_edges(self.edges, self.path)
+        self.assertEqual(get_edges_not_in_subgraph(self.EdgeList(self.edges), self.EdgeList(on_path)), off_path)
+
+    def test_directed_edges(self):
+        # Checks that in a directed graph only edges pointing along the path are on it
+        on_path, off_path = split_path_edges(self.edges, self.path, directed=True)
+        self.assertEqual(on_path, [('A', 'B'), ('C', 'D')])
+        self.assertIn(('C', 'B'), off_path)
+        subgraph = self.EdgeList([('A', 'B'), ('B', 'C'), ('C', 'D')], directed=True)
+        self.assertEqual(get_edges_not_in_subgraph(self.EdgeList(self.edges, directed=True), subgraph), off_path)
+
+    def test_thinning_keeps_path(self):
+        # Checks that a seeded sample thins only the edges off the path and picks the same edges every time
+        edges = [(i, i + 1) for i in range(100)] + [(i, i + 2) for i in range(100)]
+        on_path, off_path = split_path_edges(edges, list(range(20)))
+        sample = thin_edges(off_path, 10, seed=3)
+        self.assertEqual(len(on_path), 19)
+        self.assertEqual(len(sample), 10)
+        self.assertTrue(set(sample) <= set(off_path))
+        self.assertFalse(set(sample) & set(on_path))
+        self.assertEqual(sample, thin_edges(off_path, 10, seed=3))
+        self.assertIs(thin_edges(off_path, None), off_path)
+
+    @unittest.skipUnless(importlib.util.find_spec('matplotlib') and importlib.util.find_spec('networkx'),
+                         "Drawing needs matplotlib and networkx")
+    def test_draw_collections(self):
+        # Checks that the drawing has one collection of thinned edges and one of every path edge
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot
+        import networkx as nx
+        graph = nx.Graph(self.edges)
+        figure, ax = matplotlib.pyplot.subplots()
+        try:
+            draw_shortest_path_collections(graph, self.pos, self.path, ax=ax, max_edges=2)
+            off_path, on_path = ax.collections[:2]
+            self.assertEqual(len(off_path.get_segments()), 2)
+            self.assertEqual(len(on_path.get_segments()), 3)
+            # The edge C -> B points against the path, so a directed graph draws it with the other edges
+            ax.clear()
+            draw_shortest_path_collections(nx.DiGraph(self.edges), self.pos, self.path, ax=ax)
+            off_path, on_path = ax.collections[:2]
+            self.assertEqual(len(off_path.get_segments()), 5)
+            self.assertEqual(len(on_path.get_segments()), 2)
+        finally:
+            matplotlib.pyplot.close(figure)
+
+
+class TestMinimumSpanningTree(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = Graph()
+        self.graph.add_edges_from([('A', 'B', 4), ('A', 'C', 1), ('B', 'C', 2), ('B', 'D', 5), ('C', 'D', 8), ('D', 'E', 3)])
+
+    def test_small_graph(self):
+        # Checks that both algorithms find the same tree made of the graph's own edge objects
+        for algorithm in ['prim', 'kruskal']:
+            total_weight, edges = self.graph.minimum_spanning_tree(algorithm)
+            self.assertEqual(total_weight, 11)
+            self.assertCountEqual(edges, [self.graph.get_edge('A', 'C'), self.graph.get_edge('B', 'C'),
+                                          self.graph.get_edge('B', 'D'), self.graph.get_edge('D', 'E')])
+            for edge in edges:
+                self.assertIs(edge, self.graph.get_edge(edge.node1.name, edge.node2.name))
+
+    def test_spanning_forest(self):
+        # Checks that a graph with two components gets a tree for each of them
+        self.graph.add_edge('X', 'Y', 7)
+        self.graph.add_node('Z')
+        self.assertEqual(prim(self.graph, 'X')[0], 18)
+        self.assertEqual(len(kruskal(self.graph)[1]), 5)
+
+    def test_random_graphs(self):
+        # Checks that Prim and Kruskal agree on the total weight of random graphs
+        for seed in range(3):
+            graph = Graph()
+            graph.add_edges_from(benchmark.dense_edges(40, density=0.3, seed=seed)[0])
+            prim_weight, prim_edges = prim(graph)
+            kruskal_weight, kruskal_edges = kruskal(graph)
+            self.assertEqual(prim_weight, kruskal_weight)
+            self.assertEqual(len(prim_edges), len(kruskal_edges))
+
+    def test_union_find(self):
+        sets = UnionFind(5)
+        self.assertTrue(sets.union(0, 1))
+        self.assertTrue(sets.union(3, 4))
+        self.assertFalse(sets.union(1, 0))
+        self.assertEqual(sets.find(0), sets.find(1))
+        self.assertNotEqual(sets.find(1), sets.find(3))
+        self.assertEqual(sets.num_sets, 3)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_generators_are_seeded(self):
+        # Checks that the synthetic graphs are the same for the same seed
+        for generator in benchmark.GENERATORS.values():
+            self.assertEqual(generator(200, 3), generator(200, 3))
+        edges, positions = benchmark.scale_free_edges(100, links=2, seed=1)
+        self.assertEqual(len(edges), 98 * 2)
+        self.assertIsNone(positions)
+
+    def test_compare_results(self):
+        # Checks that a slower query and a lower build throughput are reported as regressions
+        baseline = benchmark.run_suite(['grid'], [100], num_queries=3, measure_memory=False)
+        current = json.loads(json.dumps(baseline))
+        current['results'][0]['queries']['Dijkstra']['p50_ms'] *= 2
+        current['results'][0]['build_edges_per_second'] /= 2
+        regressions = benchmark.compare_results(baseline, current)
+        self.assertCountEqual([key[2] for key, _, _ in regressions], ['Dijkstra p50_ms', 'build_edges_per_second'])
+        self.assertEqual(benchmark.compare_results(baseline, baseline), [])
@@ -0,0 +1,49 @@
+import json
+
+
+class SearchStats():
+    '''Counters and optional per-phase timings of one shortest path search.
+    Counters are filled in from the search's own data structures once the search ends,
+    so a search that is not instrumented does no extra work at all.'''
+
+    def __init__(self, timings=True, callback=None):
+        '''Initialize empty counters. If a callback is given it is called with the stats when the search ends.'''
+        self.algorithm = None
+        self.start_node = None
+        self.end_node = None
+        self.nodes_settled = 0
+        # Edges looked at from the settled nodes
+        self.edges_relaxed = 0
+        self.queue_pushes = 0
+        self.decrease_keys = 0
+        # Queue entries that were popped after a newer entry for the same node had already been settled
+        self.stale_pops = 0
+        self.record_timings = timings
+        self.timings = {}
+        self.callback = callback
+
+    def add_timing(self, phase, seconds):
+        '''Adds the time spent in a phase of the search'''
+        self.timings[phase] = self.timings.get(phase, 0) + seconds
+
+    def to_dict(self):
+        '''Returns the stats as a dictionary'''
+        return {
+            'algorithm': self.algorithm,
+            'start_node': self.start_node,
+            'end_node': self.end_node,
+            'nodes_settled': self.nodes_settled,
+            'edges_relaxed': self.edges_relaxed,
+            'queue_pushes': self.queue_pushes,
+            'decrease_keys': self.decrease_keys,
+            'stale_pops': self.stale_pops,
+            'timings': dict(self.timings),
+        }
+
+    def to_json(self):
+        '''Returns the stats as a JSON string. Node names that JSON cannot represent are written as strings.'''
+        return json.dumps(self.to_dict(), default=str)
+
+    def __repr__(self):
+        '''Print the counters'''
+        return f'SearchStats({self.to_dict()})'
@@ -0,0 +1,140 @@
+from compact_graph import CompactGraph
+from shortest_path import A_Star, Dijkstra
+import heapq
+import math
+
+
+class EdgeMask():
+    '''Temporary overlay that hides nodes and edges from a search without changing the graph'''
+
+    def __init__(self):
+        '''Initialize an overlay that hides nothing'''
+        self.nodes = set()
+        # Hidden edges are stored in both directions so lookups do not depend on the edge's node order
+        self.edges = set()
+
+    def hide_node(self, nodeName):
+        '''Hides a node and every edge connected to it'''
+        self.nodes.add(nodeName)
+
+    def hide_edge(self, node1, node2):
+        '''Hides the edge between two nodes'''
+        self.edges.add((node1, node2))
+        self.edges.add((node2, node1))
+
+    def allows(self, node1, node2):
+        '''Returns true if a search may follow the edge from node1 to node2'''
+        return node2 not in self.nodes and (node1, node2) not in self.edges
+
+
+class MaskedA_Star(A_Star):
+    '''A* search that skips the nodes and edges hidden by an EdgeMask.
+    The heuristic is a table of exact distances to the end node in the unmasked graph, which stays admissible
+    and consistent under the mask, because hiding edges can only make paths longer.'''
+
+    def __init__(self, graph, start_node, end_node, mask, distances_to_end, instrument=None):
+        self._mask = mask
+        self._distances_to_end = distances_to_end
+        # Call the A_Star class constructor
+        super().__init__(graph, start_node, end_node, instrument=instrument)
+
+    def _initialize_priority_queue(self):
+        '''Starts the queue with only the start node. Other nodes are pushed when they are first reached,
+        so a short spur search does not pay for an entry for every node in the graph.'''
+        self._queue_sort_by_index = 3
+        return [(self.start_node, 0, self.start_node, self._distance_to_target(self.start_node))]
+
+    def _update_priority_queue(self, current_distance, node_to_update, current_node):
+        '''Pushes a node that is reached for the first time, or lowers its entry if the new path is shorter'''
+        current_heuristic = current_distance + self._distance_to_target(node_to_update)
+        # Nodes that cannot reach the end node are never worth queueing
+        if current_heuristic == math.inf:
+            return
+        entry = self._priority_queue.get(node_to_update.name)
+        if entry is None:
+            self._priority_queue.push((node_to_update, current_distance, current_node, current_heuristic))
+        elif current_heuristic < entry[3]:
+            self._priority_queue.update((node_to_update, current_distance, current_node, current_heuristic))
+
+    def _distance_to_end(self):
+        '''Returns the distance of the end node, or infinity if the mask cut it off from the start node'''
+        if self.end_node.name not in self._visited:
+            return math.inf
+        return super()._distance_to_end()
+
+    def _distance_to_target(self, node):
+        '''Gets the unmasked distance from a node to the end node, or infinity if the end node cannot be reached'''
+        return self._distances_to_end.get(node.name, math.inf)
+
+    def _iter_neighbors(self, node):
+        '''Iterates over the (neighbor name, weight) pairs that the mask does not hide'''
+        name = node.name
+        allows = self._mask.allows
+        for neighbor, weight in node.iter_neighbors():
+            if allows(name, neighbor):
+                yield neighbor, weight
+
+
+def k_shortest_paths(graph, start_node, end_node, k):
+    '''Finds up to k shortest loopless paths between two nodes with Yen's algorithm.
+    Returns a list of (path, distance) pairs, shortest first.
+
+    One Dijkstra search from the end node is shared by all the spur searches: it gives the first path and
+    an exact A* heuristic for every later search, so each spur search only settles the nodes near its detour.
+    Spur searches hide the root path and the edges used by earlier paths through an EdgeMask instead of
+    copying or changing the graph, and root path lengths are read from prefix sums of the earlier paths.'''
+    assert not isinstance(graph, CompactGraph), "K shortest paths needs a Graph"
+    assert not graph.directed and graph.criteria is None, "K shortest paths needs an undirected graph with single weights"
+    assert start_node in graph and end_node in graph, "Start and end nodes must be nodes in the Graph"
+    assert k >= 1, "k must be at least 1"
+    if start_node == end_node:
+        return [([start_node], 0)]
+
+    # The graph is undirected, so the tree from the end node holds the distance from every node to the end node
+    tree = Dijkstra(graph, end_node).shortest_path_tree()
+    if not tree.is_reachable(start_node):
+        return []
+    first_path = tree.path_to(start_node)
+    first_path.reverse()
+    paths = [(first_path, tree.distance_to(start_node))]
+    distances_to_end = tree.distances
+
+    # Candidate paths as (distance, order, path), and every path that was ever found so it is only added once
+    candidates = []
+    seen = {tuple(first_path)}
+    order = 0
+    while len(paths) < k:
+        previous_path = paths[-1][0]
+        # Distance along the previous path from the start to each of its nodes
+        prefix = [0]
+        for node1, node2 in zip(previous_path, previous_path[1:]):
+            prefix.append(prefix[-1] + graph.get_edge(node1, node2).weight)
+
+        # Branch off the previous path at each of its nodes
+        for i in range(len(previous_path) - 1):
+            spur_node = previous_path[i]
+            root_path = previous_path[:i + 1]
+            mask = EdgeMask()
+            # Hide the next edge of every known path that shares this root, so the detour is new
+            for path, _ in paths:
+                if len(path) > i + 1 and path[:i + 1] == root_path:
+                    mask.hide_edge(path[i], path[i + 1])
+            # Hide the root path before the spur node so the new path has no loops
+            for node in root_path[:-1]:
+                mask.hide_node(node)
+
+            search = MaskedA_Star(graph, spur_node, end_node, mask, distances_to_end)
+            spur_distance = search.shortest_distance
+            if spur_distance == math.inf:
+                continue
+            path = root_path[:-1] + search.shortest_path
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (prefix[i] + spur_distance, order, path))
+                order += 1
+
+        if not candidates:
+            break
+        distance, _, path = heapq.heappop(candidates)
+        paths.append((path, distance))
+    return paths
@@ -0,0 +1,107 @@
+from compact_graph import CompactGraph
+from shortest_path import Dijkstra
+from array import array
+import math
+import random
+import struct
+
+# Header of the persisted landmark tables: magic, number of landmarks and number of nodes
+LANDMARK_HEADER = struct.Struct('<4sQQ')
+LANDMARK_MAGIC = b'LMRK'
+
+
+class Landmarks():
+    '''Shortest distances from a few landmark nodes to every node of a graph (ALT preprocessing).
+    By the triangle inequality |d(L, t) - d(L, v)| is a lower bound on d(v, t) for every landmark L,
+    which gives A_Star an admissible heuristic on graphs without 'pos' data.'''
+
+    def __init__(self, names, landmarks, distances):
+        '''Initialize the tables from the node names, the landmark node numbers and one distance array per landmark'''
+        self._names = names
+        self._index = {name: i for i, name in enumerate(names)}
+        self._landmarks = landmarks
+        self._distances = distances
+
+    @classmethod
+    def build(cls, graph, k=8, seed=None):
+        '''Picks k landmarks with the farthest-first rule and computes their distance tables.
+        The first landmark is a random node, and every next landmark is the node farthest from the ones picked so far.'''
+        if not isinstance(graph, CompactGraph):
+            graph = graph.freeze()
+        assert not graph.directed, "Preprocessing needs an undirected graph"
+        names = graph.nodes
+        assert names, "Graph has no nodes"
+        rng = random.Random(seed)
+
+        landmarks = array('q')
+        distances = []
+        # Distance from every node to its closest landmark so far
+        closest = [math.inf] * len(names)
+        landmark = rng.randrange(len(names))
+        for _ in range(min(k, len(names))):
+            landmarks.append(landmark)
+            tree = Dijkstra(graph, names[landmark]).shortest_path_tree()
+            table = array('d', [tree.distance_to(name) for name in names])
+            distances.append(table)
+
+            # Pick the reachable node that is farthest from all the landmarks so far
+            best = -1
+            for i, distance in enumerate(table):
+                if distance < closest[i]:
+                    closest[i] = distance
+                if closest[i] != math.inf and (best == -1 or closest[i] > closest[best]):
+                    best = i
+            if best == -1 or closest[best] == 0:
+                break
+            landmark = best
+
+        return cls(names, landmarks, distances)
+
+    @property
+    def landmarks(self):
+        '''Returns the names of the landmark nodes'''
+        return [self._names[landmark] for landmark in self._landmarks]
+
+    @property
+    def num_nodes(self):
+        '''Returns the number of nodes covered by the tables'''
+        return len(self._names)
+
+    def lower_bound_index(self, node, target):
+        '''Returns the lower bound on the distance between two node numbers'''
+        bound = 0
+        for table in self._distances:
+            # When exactly one of the nodes is unreachable from a landmark the bound is infinite,
+            # and when both are unreachable the difference is not a number and is ignored
+            difference = abs(table[target] - table[node])
+            if difference > bound:
+                bound = difference
+        return bound
+
+    def lower_bound(self, node, target):
+        '''Returns the lower bound on the distance between two node names'''
+        return self.lower_bound_index(self._index[node], self._index[target])
+
+    def save(self, path):
+        '''Saves the landmark tables so they can be reused across processes'''
+        with open(path, 'wb') as file:
+            file.write(LANDMARK_HEADER.pack(LANDMARK_MAGIC, len(self._landmarks), len(self._names)))
+            file.write(bytes(self._landmarks))
+            for table in self._distances:
+                file.write(bytes(table))
+
+    @classmethod
+    def load(cls, path, graph):
+        '''Loads landmark tables saved for a graph with the same nodes in the same order'''
+        with open(path, 'rb') as file:
+            magic, k, num_nodes = LANDMARK_HEADER.unpack(file.read(LANDMARK_HEADER.size))
+            assert magic == LANDMARK_MAGIC, "File is not a saved landmark table"
+            assert num_nodes == graph.num_nodes, "Landmark tables were saved for a different graph"
+            landmarks = array('q')
+            landmarks.frombytes(file.read(k * landmarks.itemsize))
+            distances = []
+            for _ in range(k):
+                table = array('d')
+                table.frombytes(file.read(num_nodes * table.itemsize))
+                distances.append(table)
+        return cls(graph.nodes, landmarks, distances)
@@ -0,0 +1,103 @@
+from array import array
+from heapq import heappush, heappop
+from math import inf
+
+
+class UnionFind():
+    '''Disjoint sets of the numbers 0 to n-1 stored in flat arrays.
+    Union by rank and path halving keep every find close to constant time.'''
+
+    def __init__(self, size):
+        '''Initialize size sets that each hold one number'''
+        self._parent = array('q', range(size))
+        # Upper bound on the height of each root's tree, which always stays below 64
+        self._rank = bytearray(size)
+        self.num_sets = size
+
+    def find(self, item):
+        '''Returns the representative of the set that holds an item'''
+        parent = self._parent
+        while parent[item] != item:
+            # Point every other node on the way at its grandparent to flatten the tree
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, item1, item2):
+        '''Merges the sets of two items. Returns false if they were already in the same set.'''
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        if root1 == root2:
+            return False
+        # Hang the lower tree under the higher one so the trees stay shallow
+        rank = self._rank
+        if rank[root1] < rank[root2]:
+            root1, root2 = root2, root1
+        self._parent[root2] = root1
+        if rank[root1] == rank[root2]:
+            rank[root1] += 1
+        self.num_sets -= 1
+        return True
+
+
+def prim(graph, start_node=None):
+    '''Finds a minimum spanning tree with Prim's algorithm and a binary heap of candidate edges.
+    Returns the total weight and the list of Graph.Edge objects in the tree. If the graph is not connected
+    the search restarts in every component, giving a minimum spanning forest. Runs in O(E log V).'''
+    assert not graph.directed and graph.criteria is None, "Spanning trees need an undirected graph with single weights"
+    nodes = graph._nodes
+    assert start_node is None or start_node in nodes, "Start node must be a node in the Graph"
+    visited = set()
+    # Lightest edge weight seen so far to every node outside the tree, so heavier edges are never pushed
+    lightest = {}
+    tree_edges = []
+    total_weight = 0
+    # Ties between equal weights are broken by push order, since edges cannot be compared
+    order = 0
+
+    roots = list(nodes) if start_node is None else [start_node] + list(nodes)
+    for root in roots:
+        if root in visited:
+            continue
+        visited.add(root)
+        heap = []
+        for name, edge in nodes[root]._edges.items():
+            lightest[name] = edge.weight
+            heappush(heap, (edge.weight, order, name, edge))
+            order += 1
+        # Keep taking the lightest edge that leaves the tree. Edges to nodes that were reached in the meantime are skipped.
+        while heap:
+            weight, _, name, edge = heappop(heap)
+            if name in visited:
+                continue
+            visited.add(name)
+            tree_edges.append(edge)
+            total_weight += weight
+            for neighbor, next_edge in nodes[name]._edges.items():
+                next_weight = next_edge.weight
+                if neighbor not in visited and next_weight < lightest.get(neighbor, inf):
+                    lightest[neighbor] = next_weight
+                    heappush(heap, (next_weight, order, neighbor, next_edge))
+                    order += 1
+    return total_weight, tree_edges
+
+
+def kruskal(graph):
+    '''Finds a minimum spanning tree with Kruskal's algorithm and a union-find over node numbers.
+    Returns the total weight and the list of Graph.Edge objects in the tree, or of a minimum spanning forest
+    if the graph is not connected. Runs in O(E log V), dominated by sorting the edges.'''
+    assert not graph.directed and graph.criteria is None, "Spanning trees need an undirected graph with single weights"
+    index = {name: i for i, name in enumerate(graph._nodes)}
+    edges = graph.edges
+    edges.sort(key=lambda edge: edge.weight)
+    sets = UnionFind(len(index))
+    tree_edges = []
+    total_weight = 0
+    # A spanning forest has one edge fewer than nodes in every component, so stop once everything is joined
+    for edge in edges:
+        if sets.union(index[edge.node1.name], index[edge.node2.name]):
+            tree_edges.append(edge)
+            total_weight += edge.weight
+            if sets.num_sets == 1:
+                break
+    return total_weight, tree_edges
@@ -1,5 +1,6 @@
-import networkx as nx
-import matplotlib as plt
+import random
+
+# networkx, matplotlib and numpy are heavy to import, so the drawing functions import them on first use
 
 def get_edges_from_shortest_path( shortest_path):
     '''Uses the list of nodes on the shortest path to extract the list of edges on the shortest path'''
@@ -13,16 +14,27 @@ def get_edges_from_shortest_path( shortest_path):
     # Return the list of edges
     return edges
 
+def is_directed(graph):
+    '''Checks whether a networkx graph or a Graph is directed. Objects that cannot tell are treated as undirected.'''
+    if hasattr(graph, 'is_directed'):
+        return graph.is_directed()
+    return getattr(graph, 'directed', False)
+
 def get_edges_not_in_subgraph( graph, subgraph):
     '''Uses the subgraph created from the list of edges on the path to get the list of edges not on the path'''
     # Create an array for every edge not on the path
     edges_not_in_subgraph = []
-    
+
+    # Build the set of subgraph edges once, in both directions if the graph is undirected
+    subgraph_edges = set(subgraph.edges())
+    if not is_directed(graph):
+        subgraph_edges.update((v, u) for u, v in list(subgraph_edges))
+
     # Loop through the edges in the graph
-    for u, v, d in graph.edges(data=True):
+    for u, v in graph.edges():
     
         # If the edge is not in the subgraph add it to the array
-        if (u, v) not in subgraph.edges():
+        if (u, v) not in subgraph_edges:
             edges_not_in_subgraph.append((u, v))
     
     # Return the list of edges
@@ -30,6 +42,8 @@ def get_edges_not_in_subgraph( graph, subgraph):
 
 def draw_shortest_path(graph, pos, shortest_path):
     '''Uses the original graph and the list of nodes on the shortest path to draw the '''
+    import networkx as nx
+
     # Create the subgraph with the subnodes
     shortest_path_edges = get_edges_from_shortest_path(shortest_path)
     subgraph = graph.edge_subgraph(shortest_path_edges)
@@ -60,6 +74,72 @@ def draw_shortest_path(graph, pos, shortest_path):
     nx.draw_networkx_edge_labels(graph, pos, edge_labels, rotate=False)
 
 
+def split_path_edges(edges, shortest_path, directed=False):
+    '''Splits (u, v) edges into the edges on the shortest path and the edges not on it with one set lookup per edge.
+    In a directed graph an edge is only on the path if it points the same way as the path.'''
+    path_edges = set(get_edges_from_shortest_path(shortest_path))
+    # Store the path edges in both directions if the graph is undirected
+    if not directed:
+        path_edges.update((v, u) for u, v in list(path_edges))
+    on_path = []
+    off_path = []
+    for u, v in edges:
+        if (u, v) in path_edges:
+            on_path.append((u, v))
+        else:
+            off_path.append((u, v))
+    return on_path, off_path
+
+def thin_edges(edges, max_edges, seed=0):
+    '''Returns a random sample of max_edges of the edges, or all of them if there are not that many.
+    The same seed always picks the same sample, so redrawing a graph does not flicker.'''
+    if max_edges is None or len(edges) <= max_edges:
+        return edges
+    return random.Random(seed).sample(edges, max_edges)
+
+def draw_shortest_path_collections(graph, pos, shortest_path, ax=None, max_edges=None, seed=0, show_nodes=False):
+    '''Draws a shortest path over a large graph with one matplotlib collection per layer instead of one artist per edge.
+    The graph can be a networkx graph or a Graph. pos maps node names to (x, y) coordinates.
+    If max_edges is given, the edges not on the path are thinned to a random sample of that size (level of detail),
+    while the path itself is always drawn in full. Returns the matplotlib axes.'''
+    import matplotlib.pyplot
+    from matplotlib.collections import LineCollection
+    import numpy as np
+
+    if ax is None:
+        ax = matplotlib.pyplot.gca()
+
+    # Get the edges as (u, v) pairs from either kind of graph and split them once
+    if hasattr(graph, 'iter_edges'):
+        edges = ((edge.node1.name, edge.node2.name) for edge in graph.iter_edges())
+    else:
+        edges = graph.edges()
+    on_path, off_path = split_path_edges(edges, shortest_path, is_directed(graph))
+    off_path = thin_edges(off_path, max_edges, seed)
+
+    # Number the nodes and store their coordinates in one array, so segments are gathered with array indexing
+    index = {name: i for i, name in enumerate(pos)}
+    coordinates = np.array([pos[name] for name in pos], dtype=float).reshape(-1, 2)
+
+    def segments(edge_list):
+        '''Returns an (edges, 2, 2) array of the start and end coordinates of the edges'''
+        if not edge_list:
+            return np.zeros((0, 2, 2))
+        ends = np.array([(index[u], index[v]) for u, v in edge_list], dtype=np.int64)
+        return coordinates[ends]
+
+    # Draw the edges not on the path with 75% transparency, then the path on top of them
+    ax.add_collection(LineCollection(segments(off_path), colors='gray', alpha=0.25, linewidths=0.5))
+    ax.add_collection(LineCollection(segments(on_path), colors='#465368', linewidths=2))
+
+    # Draw every node faintly if requested, and the nodes on the path
+    if show_nodes:
+        ax.scatter(coordinates[:, 0], coordinates[:, 1], s=2, color='#465368', alpha=0.25)
+    path_coordinates = coordinates[[index[name] for name in shortest_path]]
+    ax.scatter(path_coordinates[:, 0], path_coordinates[:, 1], s=10, color='#465368', zorder=3)
+    ax.autoscale_view()
+    return ax
+
 
 def print_shortest_path_info( source, target, path, length):
     '''Displays the order of nodes on the shortest path, and the total distance.'''
@@ -0,0 +1,154 @@
+import heapq
+import math
+
+
+class ListPriorityQueue():
+    '''Reference priority queue that keeps every entry in a plain list.
+    The list is re-sorted on every access and entries are found with a linear scan,
+    which makes it slow but easy to print step by step.'''
+
+    def __init__(self, entries, sort_by_index, counting=False):
+        '''Initialize the queue with a list of (node, distance, previous_node, ...) entries.
+        The counters read by the search instrumentation are only kept up to date if counting is true.'''
+        self._entries = list(entries)
+        self._sort_by_index = sort_by_index
+        self._counting = counting
+        # Entries for nodes that have not been reached yet are placeholders, so only reached nodes count as pushes
+        self.pushes = _count_reached(self._entries) if counting else 0
+        self.decrease_keys = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        '''Returns the number of entries left in the queue'''
+        return len(self._entries)
+
+    def __iter__(self):
+        '''Iterates over the entries in their current order'''
+        return iter(self._entries)
+
+    def __getitem__(self, index):
+        '''Returns the entry at a position in the queue'''
+        return self._entries[index]
+
+    def sorted_entries(self):
+        '''Sorts the entries by their priority and returns them'''
+        self._entries.sort(key=lambda queue_object: queue_object[self._sort_by_index])
+        return self._entries
+
+    def pop(self):
+        '''Removes and returns the entry with the lowest priority'''
+        return self.sorted_entries().pop(0)
+
+    def get(self, name):
+        '''Returns the entry for a node name, or None if it is not in the queue'''
+        for entry in self._entries:
+            if entry[0].name == name:
+                return entry
+        return None
+
+    def push(self, entry):
+        '''Adds an entry for a node that is not in the queue yet'''
+        self._entries.append(entry)
+        if self._counting:
+            self.pushes += 1
+
+    def update(self, entry):
+        '''Replaces the entry for a node with a new entry'''
+        for i, queue_entry in enumerate(self._entries):
+            if queue_entry[0] == entry[0]:
+                if self._counting:
+                    # Every update counts as a push like in a heap, and lowering a key that was already reached
+                    # also counts as a decrease-key
+                    self.pushes += 1
+                    if queue_entry[self._sort_by_index] != math.inf:
+                        self.decrease_keys += 1
+                self._entries[i] = entry
+                break
+
+
+class HeapPriorityQueue():
+    '''Binary heap priority queue with lazy deletion.
+    Updating an entry pushes a new copy onto the heap, and stale copies are skipped when they are popped.'''
+
+    def __init__(self, entries, sort_by_index, counting=False):
+        '''Initialize the queue with a list of (node, distance, previous_node, ...) entries.
+        The counters read by the search instrumentation are only kept up to date if counting is true.'''
+        self._sort_by_index = sort_by_index
+        self._counting = counting
+        # The live entry for every node that is still in the queue
+        self._entries = {}
+        # The insertion order of every node, used to break ties between equal priorities
+        self._order = {}
+        self._heap = []
+        for order, entry in enumerate(entries):
+            name = entry[0].name
+            self._entries[name] = entry
+            self._order[name] = order
+            self._heap.append((entry[sort_by_index], order, entry))
+        heapq.heapify(self._heap)
+        # Entries for nodes that have not been reached yet are placeholders, so only reached nodes count as pushes
+        self.pushes = _count_reached(self._entries.values()) if counting else 0
+        self.decrease_keys = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        '''Returns the number of live entries left in the queue'''
+        return len(self._entries)
+
+    def __iter__(self):
+        '''Iterates over the live entries in insertion order'''
+        return iter(self._entries.values())
+
+    def __getitem__(self, index):
+        '''Returns the live entry at a position in sorted order'''
+        return self.sorted_entries()[index]
+
+    def sorted_entries(self):
+        '''Returns the live entries sorted by their priority'''
+        return sorted(self._entries.values(),
+                      key=lambda queue_object: (queue_object[self._sort_by_index], self._order[queue_object[0].name]))
+
+    def pop(self):
+        '''Removes and returns the entry with the lowest priority, skipping stale copies'''
+        while self._heap:
+            entry = heapq.heappop(self._heap)[2]
+            name = entry[0].name
+            # Only the copy that is still stored as the live entry counts
+            if self._entries.get(name) is entry:
+                del self._entries[name]
+                return entry
+            if self._counting:
+                self.stale_pops += 1
+        raise IndexError("pop from an empty priority queue")
+
+    def get(self, name):
+        '''Returns the live entry for a node name, or None if it is not in the queue'''
+        return self._entries.get(name)
+
+    def push(self, entry):
+        '''Adds an entry for a node that is not in the queue yet'''
+        name = entry[0].name
+        order = len(self._order)
+        self._entries[name] = entry
+        self._order[name] = order
+        heapq.heappush(self._heap, (entry[self._sort_by_index], order, entry))
+        if self._counting:
+            self.pushes += 1
+
+    def update(self, entry):
+        '''Replaces the entry for a node by pushing a new copy onto the heap'''
+        name = entry[0].name
+        if name not in self._entries:
+            return
+        if self._counting:
+            # Only lowering a key that was already reached counts as a decrease-key
+            if self._entries[name][self._sort_by_index] != math.inf:
+                self.decrease_keys += 1
+            self.pushes += 1
+        self._entries[name] = entry
+        heapq.heappush(self._heap, (entry[self._sort_by_index], self._order[name], entry))
+
+
+def _count_reached(entries):
+    '''Counts the (node, distance, ...) entries whose node has been reached, which is usually only the start node'''
+    return sum(1 for entry in entries if entry[1] != math.inf)
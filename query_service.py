@@ -0,0 +1,101 @@
+from shortest_path import Dijkstra
+from collections import OrderedDict
+import math
+import sys
+
+
+class ShortestPathService():
+    '''Answers shortest path queries on a graph and caches the results.
+    The cache is a bounded least recently used (LRU) cache that is emptied whenever the Graph's version changes,
+    so results never outlive an add_node, add_edge or remove_node.'''
+
+    def __init__(self, graph, algorithm=Dijkstra, max_entries=1024, max_bytes=None, **options):
+        '''Initialize the service. Extra options, such as landmarks for A_Star, are passed to the algorithm.'''
+        self.graph = graph
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._options = options
+        # Cached (path, distance, size) results by (start, end), from least to most recently used
+        self._cache = OrderedDict()
+        self._version = getattr(graph, 'version', None)
+        self.cache_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def stats(self):
+        '''Returns the cache counters'''
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._cache),
+            'bytes': self.cache_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def clear(self):
+        '''Removes every cached result'''
+        self._cache.clear()
+        self.cache_bytes = 0
+
+    def query(self, start_node, end_node):
+        '''Returns the shortest path and distance between two nodes.
+        The path is None if the end node cannot be reached.'''
+        # Drop every cached result if the graph changed since they were calculated
+        version = getattr(self.graph, 'version', None)
+        if version != self._version:
+            if self._cache:
+                self.invalidations += 1
+            self.clear()
+            self._version = version
+
+        key = (start_node, end_node)
+        entry = self._cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            path, distance, _ = entry
+            return (list(path) if path is not None else None, distance)
+
+        self.misses += 1
+        search = self.algorithm(self.graph, start_node, end_node, **self._options)
+        distance = search.shortest_distance
+        path = search.shortest_path if distance != math.inf else None
+        self._store(key, path, distance)
+        return (list(path) if path is not None else None, distance)
+
+    def shortest_path(self, start_node, end_node):
+        '''Returns the names of the nodes on the shortest path between two nodes'''
+        return self.query(start_node, end_node)[0]
+
+    def shortest_distance(self, start_node, end_node):
+        '''Returns the shortest distance between two nodes'''
+        return self.query(start_node, end_node)[1]
+
+    def _store(self, key, path, distance):
+        '''Adds a result to the cache and evicts the least recently used results until it fits'''
+        size = _result_size(key, path, distance)
+        # A result that is larger than the whole cache is not worth keeping
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._cache[key] = (path, distance, size)
+        self.cache_bytes += size
+        while len(self._cache) > self.max_entries or (self.max_bytes is not None and self.cache_bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._cache.popitem(last=False)
+            self.cache_bytes -= evicted_size
+            self.evictions += 1
+
+
+def _result_size(key, path, distance):
+    '''Estimates the number of bytes used by a cached result'''
+    size = sys.getsizeof(key) + sys.getsizeof(distance)
+    if path is not None:
+        # Node names are shared with the graph, so only the list itself is counted
+        size += sys.getsizeof(path)
+    return size
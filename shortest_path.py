@@ -1,17 +1,74 @@
 from graph import Graph
+from compact_graph import CompactGraph
+from priority_queue import HeapPriorityQueue, ListPriorityQueue
+from instrumentation import SearchStats
+from array import array
+from operator import attrgetter
+import heapq
 import math
-from tabulate import tabulate
+import time
+
+class SearchCancelled(Exception):
+    '''Raised inside a search when its cancel event has been set'''
+
+# Reads the stored weight of an edge
+_edge_weight = attrgetter('weight')
+
+# Priority queue backends that can be selected by name
+PRIORITY_QUEUES = {
+    'heap': HeapPriorityQueue,
+    'list': ListPriorityQueue,
+}
 
 class ShortestPathBase():
-    def __init__(self, graph, start_node, end_node, log=False):
-        assert start_node in graph.nodes, "Start node must be a node in the Graph"
+    def __init__(self, graph, start_node, end_node, log=False, queue=None, instrument=None, cancel=None, weight=None):
+        assert start_node in graph, "Start node must be a node in the Graph"
         self.graph = graph
+        # The cost selection of a multi-criteria graph, or a function of the edge weights (see weight_profiles)
+        self.weight = weight
+        # Optional threading.Event (or anything with is_set) that is checked before every step of the search
+        self._cancel = cancel
+        # Instrumentation is off unless instrument is True, a SearchStats object or a callback for the stats
+        if instrument is None or instrument is False:
+            self.stats = None
+        elif isinstance(instrument, SearchStats):
+            self.stats = instrument
+        elif callable(instrument):
+            self.stats = SearchStats(callback=instrument)
+        else:
+            self.stats = SearchStats()
+        initialize_start = time.perf_counter() if self.stats is not None else None
+        # A CompactGraph is searched with node numbers and arrays instead of node objects
+        self._compact = isinstance(graph, CompactGraph)
         self.start_node = self.graph.get_node(start_node)
-        self.end_node = self.graph.get_node(end_node)
+        # The end node is optional so that a search can settle every node reachable from the start
+        self.end_node = self.graph.get_node(end_node) if end_node is not None else None
         self._current_node = self.graph.get_node(start_node)
-        self._priority_queue = self._initialize_priority_queue()
         self._visited = {}
+        # A CompactGraph never changes, while a Graph records a version that goes up on every change
+        self._graph_version = getattr(graph, 'version', None)
+        if self._compact:
+            assert not log and queue is None, "Step tables and queue backends are not available for a CompactGraph"
+            # The whole array of edge costs for the selected weight, built once and shared by every search
+            self._cost_weights = graph.cost_weights(weight)
+            self._initialize_compact_search()
+        else:
+            # The list queue is the reference used for the step tables, the heap is used otherwise
+            if queue is None:
+                queue = 'list' if log else 'heap'
+            self._queue_class = PRIORITY_QUEUES.get(queue, queue)
+            # Function from an edge weight to the selected cost, or None to use the weights as they are
+            self._cost = graph.cost_function(weight)
+            self._priority_queue = self._queue_class(self._initialize_priority_queue(), self._queue_sort_by_index,
+                                                     counting=self.stats is not None)
+        if self.stats is not None and self.stats.record_timings:
+            self.stats.add_timing('initialize', time.perf_counter() - initialize_start)
         self.__log = log
+        # Results are cached here once the search has reached the end node
+        self._shortest_path = None
+        self._shortest_distance = None
+        # Stats are collected and passed to the callback once, when the search first finishes
+        self._stats_collected = False
 
     # Define an "abstract" method to define the priority queue to be used in the path finding algorithm
     def _initialize_priority_queue(self):
@@ -25,37 +82,58 @@ class ShortestPathBase():
     def priority_queue(self):
         '''Returns a version of the priority queue sorted by distance'''
         # Sort the entries of the priority queue by their total distance
-        self._priority_queue.sort(key=lambda queue_object: queue_object[self._queue_sort_by_index])
-        return self._priority_queue
-    
-    @property
-    def __visited(self):
-        '''Returns the names of the already visited elements as a set'''
-        # Get the keys of all entries in the priority queue
-        return set(self._visited.keys())
-    
+        return self._priority_queue.sorted_entries()
     
     def dequeue(self):
         '''Removes the top entry from the priority queue and adds it to the dictionary of visited elements'''
         # Pop the element off the queue and an entry in the visited dictionary
-        element = self.priority_queue.pop(0)
+        element = self._priority_queue.pop()
         self._visited[element[0].name] = element
         
         return element
     
     def _get_unvisited_neighbors(self, node):
         '''Gets the set of unvisited neighbors of the current element'''
-        # Get unvisited neighbors by subtracting the set of visited nodes from the set of neighbors
-        current_neighbors = set(node.get_adjacent_nodes())
-        unvisited_neighbors = current_neighbors - self.__visited
-        
-        return unvisited_neighbors
+        # Look every neighbor up in the visited dictionary instead of building a set of all visited nodes
+        visited = self._visited
+        return {name for name, _ in self._iter_neighbors(node) if name not in visited}
+
+    def _iter_neighbors(self, node):
+        '''Iterates over the (neighbor name, weight) pairs the search may follow from a node.
+        Subclasses can override this to hide edges from the search.'''
+        cost = self._cost
+        if cost is None:
+            return node.iter_neighbors()
+        # Map the cost over all of the node's outgoing edges at once instead of calling it edge by edge
+        edges = node._edges
+        return zip(edges.keys(), map(cost, map(_edge_weight, edges.values())))
+
+    def _iter_in_neighbors(self, node):
+        '''Iterates over the (neighbor name, weight) pairs of the edges into a node, for searches that run backward'''
+        cost = self._cost
+        if cost is None:
+            return node.iter_in_neighbors()
+        edges = node._in_edges
+        return zip(edges.keys(), map(cost, map(_edge_weight, edges.values())))
     
-    def _shortest_paths(self):
-        '''Calculates the shortest path between the start node and every other node'''
+    def _shortest_paths(self, settle_all=False):
+        '''Calculates the shortest path between the start node and every node up to the end node.
+        The search stops as soon as the end node has been settled, unless settle_all is set
+        or there is no end node, in which case every node in the graph is settled.'''
+        if self._compact:
+            return self._compact_shortest_paths(settle_all)
+        stop_node = None if settle_all else self.end_node
+        # Nothing left to do if the end node was already settled by an earlier call
+        if stop_node is not None and stop_node.name in self._visited:
+            return
         counter = 1
+        cancel = self._cancel
+        nodes = self.graph._nodes
+        visited = self._visited
         # While there are nodes in the priority queue
-        while self.priority_queue:
+        while self._priority_queue:
+            if cancel is not None and cancel.is_set():
+                raise SearchCancelled("Search was cancelled")
 
             if self.__log == True:
                 # Print the queues
@@ -68,21 +146,86 @@ class ShortestPathBase():
             current_node = current_element[0]
             current_distance = current_element[1]
     
-            # Get the previously unvisited neighbors of the element being visited
-            unvisited_neighbors = self._get_unvisited_neighbors(current_node)
-            
-            # Update the priority queue to reflect the distances 
-            for neighbor in unvisited_neighbors:
-                neighbor = self.graph.get_node(neighbor)
-                distance = self.graph.get_edge(current_node, neighbor).weight + current_distance
-                self._update_priority_queue(distance, neighbor, current_node)
+            # Update the priority queue to reflect the distances to the previously unvisited neighbors
+            for neighbor, weight in self._iter_neighbors(current_node):
+                if neighbor not in visited:
+                    self._update_priority_queue(weight + current_distance, nodes[neighbor], current_node)
+
+            # Once the end node is settled its distance and path can no longer change
+            if current_node is stop_node:
+                break
             
+    def _initialize_compact_search(self):
+        '''Initializes the distance, previous node and settled arrays used to search a CompactGraph'''
+        num_nodes = self.graph.num_nodes
+        self._distances = array('d', [math.inf]) * num_nodes
+        self._previous = array('q', [-1]) * num_nodes
+        self._settled = bytearray(num_nodes)
+        # Number of heap pops, from which the instrumentation works out the other queue counters
+        self._pops = 0
+        self._distances[self.start_node] = 0
+        self._previous[self.start_node] = self.start_node
+        # The heap holds (priority, node) pairs, and pairs for already settled nodes are skipped when popped
+        self._compact_heap = [(self._compact_priority(0, self.start_node), self.start_node)]
+
+    def _compact_priority(self, distance, node):
+        '''Returns the priority of a node number in the CompactGraph search'''
+        return distance
+
+    def _compact_shortest_paths(self, settle_all=False):
+        '''Runs the search over the CSR arrays of a CompactGraph, stopping once the end node is settled'''
+        stop_node = -1 if settle_all or self.end_node is None else self.end_node
+        if stop_node >= 0 and self._settled[stop_node]:
+            return
+        # Bind the arrays to local names to keep the inner loop fast
+        heap = self._compact_heap
+        distances = self._distances
+        previous = self._previous
+        settled = self._settled
+        offsets = self.graph._offsets
+        targets = self.graph._targets
+        weights = self._cost_weights
+        priority = self._compact_priority
+        heappop = heapq.heappop
+        heappush = heapq.heappush
+        pops = 0
+        cancel = self._cancel
+
+        while heap:
+            if cancel is not None and cancel.is_set():
+                self._pops += pops
+                raise SearchCancelled("Search was cancelled")
+            current_node = heappop(heap)[1]
+            pops += 1
+            if settled[current_node]:
+                continue
+            settled[current_node] = 1
+            current_distance = distances[current_node]
+
+            # Relax every edge of the current node
+            for i in range(offsets[current_node], offsets[current_node + 1]):
+                neighbor = targets[i]
+                if settled[neighbor]:
+                    continue
+                distance = current_distance + weights[i]
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    previous[neighbor] = current_node
+                    heappush(heap, (priority(distance, neighbor), neighbor))
+
+            if current_node == stop_node:
+                break
+        self._pops += pops
+
     def _print_queues(self, counter):
-       
+        # tabulate is only needed for the step tables, so it is imported on first use
+        from tabulate import tabulate
+
         # Get the visited key list
         visited_key_list = list(self._visited.keys())
 
-        priority_queue_len = len(self._priority_queue)
+        priority_queue = self.priority_queue
+        priority_queue_len = len(priority_queue)
         visited_len = len(visited_key_list)
 
         print_length = max(priority_queue_len, visited_len)
@@ -104,7 +247,7 @@ class ShortestPathBase():
                 if i >= priority_queue_len:
                     queue = "\t\t"
                 else:
-                    queue = self._priority_queue[i]
+                    queue = priority_queue[i]
 
                 table_data.append((queue, visited))
 
@@ -115,10 +258,88 @@ class ShortestPathBase():
     @property     
     def shortest_path(self):
         '''Displays the shortest path between the start node and the end node'''
+        # Only calculate the path the first time, and return a copy of the cached path after that
+        if self._shortest_path is None:
+            assert self.end_node is not None, "An end node is needed to find a shortest path"
+            # Call the shortest path method which performs the algorithm to find the shortest paths
+            self._run_search()
+            if self.stats is not None and self.stats.record_timings:
+                path_start = time.perf_counter()
+                self._shortest_path = self._path_to_end()
+                self.stats.add_timing('path', time.perf_counter() - path_start)
+            else:
+                self._shortest_path = self._path_to_end()
+        return list(self._shortest_path)
+    
+    @property
+    def shortest_distance(self):
+        '''Gets the total distance from the start node to the end node'''
+        if self._shortest_distance is None:
+            assert self.end_node is not None, "An end node is needed to find a shortest distance"
+            self._run_search()
+            self._shortest_distance = self._distance_to_end()
+        
+        return self._shortest_distance
+
+    def _run_search(self, settle_all=False):
+        '''Runs the search, and the first time it finishes collects its stats and calls the stats callback
+        if it is instrumented. Reading several results of one search reports it only once.'''
+        if self.stats is None or self._stats_collected:
+            self._shortest_paths(settle_all)
+            return
+        search_start = time.perf_counter()
+        self._shortest_paths(settle_all)
+        if self.stats.record_timings:
+            self.stats.add_timing('search', time.perf_counter() - search_start)
+        self._collect_stats()
+        self._stats_collected = True
+        if self.stats.callback is not None:
+            self.stats.callback(self.stats)
+
+    def _collect_stats(self):
+        '''Fills in the counters of the stats from the state of the search'''
+        stats = self.stats
+        stats.algorithm = type(self).__name__
+        if self._compact:
+            stats.start_node = self.graph.get_name(self.start_node)
+            stats.end_node = self.graph.get_name(self.end_node) if self.end_node is not None else None
+            offsets = self.graph._offsets
+            settled_nodes = [node for node, settled in enumerate(self._settled) if settled]
+            stats.nodes_settled = len(settled_nodes)
+            stats.edges_relaxed = sum(offsets[node + 1] - offsets[node] for node in settled_nodes)
+            # Every node reached gets one push, and every push after the first for a node is a decrease-key
+            stats.queue_pushes = self._pops + len(self._compact_heap)
+            reached = sum(1 for distance in self._distances if distance != math.inf)
+            stats.decrease_keys = stats.queue_pushes - reached
+            stats.stale_pops = self._pops - stats.nodes_settled
+        else:
+            stats.start_node = self.start_node.name
+            stats.end_node = self.end_node.name if self.end_node is not None else None
+            stats.nodes_settled = len(self._visited)
+            stats.edges_relaxed = sum(len(element[0]._edges) for element in self._visited.values())
+            stats.queue_pushes = self._priority_queue.pushes
+            stats.decrease_keys = self._priority_queue.decrease_keys
+            stats.stale_pops = self._priority_queue.stale_pops
+
+    @property
+    def is_stale(self):
+        '''Returns true if the graph has changed since the search was created'''
+        return getattr(self.graph, 'version', None) != self._graph_version
+
+    @property
+    def num_settled(self):
+        '''Returns the number of nodes settled by the search so far'''
+        if self._compact:
+            return self._settled.count(1)
+        return len(self._visited)
+
+    def _path_to_end(self):
+        '''Builds the list of node names on the shortest path once the end node has been settled'''
+        if self._compact:
+            return self._compact_path_to(self.end_node)
+        assert self._distance_to_end() != math.inf, "End node is not reachable from the start node"
         # Initialize a path list to store the path taken to the end_node
         path = [self.end_node.name]
-        # Call the shortest path method which performs the algorithm to find the shortest paths
-        self._shortest_paths()
         # Start at the end
         current_node = self.end_node
         
@@ -131,20 +352,49 @@ class ShortestPathBase():
         
         # Reverse the list so that it displays the start at the start and the end at the end
         path.reverse()
-        
         return path
-    
-    @property
-    def shortest_distance(self):
-        '''Gets the total distance from the start node to the end node'''
-        self._shortest_paths()
-        
+
+    def _distance_to_end(self):
+        '''Returns the distance of the end node once it has been settled'''
+        if self._compact:
+            return self._distances[self.end_node]
         return self._visited[self.end_node.name][1]
+
+    def _compact_path_to(self, node):
+        '''Follows the previous node array of a CompactGraph search back from a node to the start'''
+        assert self._previous[node] != -1, "Node is not reachable from the start node"
+        path = [self.graph.get_name(node)]
+        while node != self.start_node:
+            node = self._previous[node]
+            path.append(self.graph.get_name(node))
+        path.reverse()
+        return path
     
 class Dijkstra(ShortestPathBase):
-    def __init__(self, graph, start_node, end_node, log=False):
+    def __init__(self, graph, start_node, end_node=None, log=False, queue=None, instrument=None, cancel=None, weight=None):
         # Call the ShortestPathBase class constructor
-        super().__init__(graph, start_node, end_node, log)
+        super().__init__(graph, start_node, end_node, log, queue, instrument, cancel, weight)
+
+    def shortest_path_tree(self):
+        '''Settles every node reachable from the start node and returns the shortest path tree'''
+        self._run_search(settle_all=True)
+        distances = {}
+        predecessors = {}
+        if self._compact:
+            # Read the tree from the distance and previous node arrays
+            get_name = self.graph.get_name
+            for node, distance in enumerate(self._distances):
+                if distance != math.inf:
+                    distances[get_name(node)] = distance
+                    previous_node = self._previous[node]
+                    predecessors[get_name(node)] = get_name(previous_node) if previous_node != node else None
+            return ShortestPathTree(get_name(self.start_node), distances, predecessors)
+        # Unreachable nodes are settled with an infinite distance and are left out of the tree
+        for name, (node, distance, previous_node) in self._visited.items():
+            if distance != float('inf'):
+                distances[name] = distance
+                predecessors[name] = previous_node.name if previous_node is not node else None
+        return ShortestPathTree(self.start_node.name, distances, predecessors)
 
 
     def _initialize_priority_queue(self):
@@ -152,10 +402,8 @@ class Dijkstra(ShortestPathBase):
         Adds an entry for the start node with distance 0, and each other node with the distance infinity '''
         priority_queue = []
         self._queue_sort_by_index = 1
-        # Loop through all nodes in the graph
-        for node in self.graph.nodes:
-            # Get the node element by its name from the graph
-            node = self.graph.get_node(node)
+        # Loop through all node objects in the graph
+        for node in self.graph._nodes.values():
             # If the current node is not the start node, make the initial distance infinity
             if node != self.start_node:
                 priority_queue.append((node, float('inf'), None))
@@ -168,27 +416,30 @@ class Dijkstra(ShortestPathBase):
     def _update_priority_queue(self, current_distance, node_to_update, current_node):
         '''Updates a node's entry in the priority queue if the total distance to this node is less than the previous total distance'''
         # Look for the entry in the priority queue that matches the node we are updating
-        for i, (node, distance, previous_node) in enumerate(self._priority_queue):
-            if node == node_to_update:
-                # If the current distance to the node is shorter than the distance previously entered for the node, update it
-                if current_distance < distance:
-                    self._priority_queue[i] = (node, current_distance, current_node)
-                break
+        entry = self._priority_queue.get(node_to_update.name)
+        # If the current distance to the node is shorter than the distance previously entered for the node, update it
+        if entry is not None and current_distance < entry[1]:
+            self._priority_queue.update((node_to_update, current_distance, current_node))
 
 class A_Star(ShortestPathBase):
-    def __init__(self, graph, start_node, end_node, log=False):
+    def __init__(self, graph, start_node, end_node, log=False, queue=None, landmarks=None, instrument=None, cancel=None, weight=None):
+        '''The straight line and landmark heuristics must never overestimate the selected cost,
+        so a weight selection other than plain distances usually needs landmarks built for that cost.'''
+        assert end_node is not None, "A* needs an end node for its heuristic"
+        # Landmark tables replace the straight line heuristic, so the nodes do not need 'pos' data
+        self._landmarks = landmarks
+        # Heuristic distances are calculated once per node for this query
+        self._heuristic_cache = {}
         # Call the ShortestPathBase class constructor
-        super().__init__(graph, start_node, end_node, log)
+        super().__init__(graph, start_node, end_node, log, queue, instrument, cancel, weight)
 
     def _initialize_priority_queue(self):
         '''Initializes the priority queue. 
         Adds an entry for the start node with distance 0, and each other node with the distance infinity'''
         priority_queue = []
         self._queue_sort_by_index = 3
-        # Loop through all nodes in the graph
-        for node in self.graph.nodes:
-            # Get the node element by its name from the graph
-            node = self.graph.get_node(node)
+        # Loop through all node objects in the graph
+        for node in self.graph._nodes.values():
             # If the current node is not the start node, make the initial distance infinity
             if node != self.start_node:
                 # Each entry in the priority queue has the node, the path length, the previous node on the path, and a combined heuristic
@@ -199,11 +450,36 @@ class A_Star(ShortestPathBase):
                 priority_queue.append((node, 0, node, heuristic_distance))
         return priority_queue
   
+    def _compact_priority(self, distance, node):
+        '''Returns the path length plus the heuristic distance to the target for a node number'''
+        return distance + self._compact_distance_to_target(node)
+
+    def _compact_distance_to_target(self, node):
+        '''Gets the distance between the target node and a node number of a CompactGraph.
+        Landmark tables must have been built from a graph with the same node order.'''
+        distance = self._heuristic_cache.get(node)
+        if distance is None:
+            if self._landmarks is not None:
+                distance = self._landmarks.lower_bound_index(node, self.end_node)
+            else:
+                target_x, target_y = self.graph.get_position(self.end_node)
+                current_x, current_y = self.graph.get_position(node)
+                distance = math.sqrt((target_x-current_x)**2 + (target_y-current_y)**2)
+            self._heuristic_cache[node] = distance
+        return distance
+
     def _distance_to_target(self, node):
-        '''Gets the distance between the target node and the current node'''
-        target_pos = self.end_node.get_data('pos')
-        current_pos = node.get_data('pos')
-        distance = round(math.sqrt((target_pos[0]-current_pos[0])**2 + (target_pos[1]-current_pos[1])**2),0)
+        '''Gets the distance between the target node and the current node.
+        The distance is not rounded, since rounding up can overestimate it and make the heuristic inadmissible.'''
+        distance = self._heuristic_cache.get(node.name)
+        if distance is None:
+            if self._landmarks is not None:
+                distance = self._landmarks.lower_bound(node.name, self.end_node.name)
+            else:
+                target_pos = self.end_node.get_data('pos')
+                current_pos = node.get_data('pos')
+                distance = math.sqrt((target_pos[0]-current_pos[0])**2 + (target_pos[1]-current_pos[1])**2)
+            self._heuristic_cache[node.name] = distance
         return distance
 
     def _update_priority_queue(self, current_distance, node_to_update, current_node):
@@ -211,9 +487,218 @@ class A_Star(ShortestPathBase):
         # Get the current heuristic, which is equal to the length of the path plus the distance to the target
         current_heuristic = current_distance + self._distance_to_target(node_to_update)
         # Look for the entry in the priority queue that matches the node we are updating
-        for i, (node, distance, previous_node, heuristic_distance) in enumerate(self._priority_queue):
-            if node == node_to_update:
-                # If the current distance to the node is shorter than the distance previously entered for the node, update it
-                if current_heuristic < heuristic_distance:
-                    self._priority_queue[i] = (node, current_distance, current_node, current_heuristic)
-                break
\ No newline at end of file
+        entry = self._priority_queue.get(node_to_update.name)
+        # If the current distance to the node is shorter than the distance previously entered for the node, update it
+        if entry is not None and current_heuristic < entry[3]:
+            self._priority_queue.update((node_to_update, current_distance, current_node, current_heuristic))
+
+
+class BidirectionalDijkstra(ShortestPathBase):
+    '''Point to point search that runs Dijkstra forward from the start node and backward from the end node
+    until the two searches meet, which usually settles far fewer nodes than a single forward search'''
+
+    def __init__(self, graph, start_node, end_node, instrument=None, cancel=None, weight=None):
+        assert not isinstance(graph, CompactGraph), "Bidirectional search needs a Graph"
+        assert end_node is not None, "Bidirectional search needs an end node"
+        # Call the ShortestPathBase class constructor
+        super().__init__(graph, start_node, end_node, instrument=instrument, cancel=cancel, weight=weight)
+        # Distances, previous nodes and heaps of the forward (0) and backward (1) searches, keyed by node name
+        self._distances = ({self.start_node.name: 0}, {self.end_node.name: 0})
+        self._previous = ({self.start_node.name: None}, {self.end_node.name: None})
+        self._settled_sides = (set(), set())
+        self._heaps = ([(self._key(0, self.start_node, 0), self.start_node.name)],
+                       [(self._key(1, self.end_node, 0), self.end_node.name)])
+        # Heap counters read by the instrumentation
+        self._pushes = 2
+        self._pops = 0
+        # The best path found so far meets the two searches at this node
+        self._meeting_node = self.start_node.name if self.start_node is self.end_node else None
+        self._best_distance = 0 if self.start_node is self.end_node else math.inf
+
+    def _initialize_priority_queue(self):
+        '''The two searches keep their own heaps, so the shared priority queue stays empty'''
+        self._queue_sort_by_index = 1
+        return []
+
+    def _potential(self, side, node):
+        '''Returns the amount added to a node's distance to get its priority on one side of the search'''
+        return 0
+
+    def _key(self, side, node, distance):
+        '''Returns the priority of a node on one side of the search'''
+        return distance + self._potential(side, node)
+
+    def _top_key(self, side):
+        '''Returns the lowest priority on one side, dropping entries for nodes that are already settled'''
+        heap = self._heaps[side]
+        settled = self._settled_sides[side]
+        while heap and heap[0][1] in settled:
+            heapq.heappop(heap)
+            self._pops += 1
+        return heap[0][0] if heap else math.inf
+
+    def _shortest_paths(self, settle_all=False):
+        '''Alternates between the two searches until no better meeting point can be found'''
+        nodes = self.graph._nodes
+        cancel = self._cancel
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise SearchCancelled("Search was cancelled")
+            forward_key = self._top_key(0)
+            backward_key = self._top_key(1)
+            # Stop once the two lowest priorities add up to at least the best path found,
+            # which also covers one of the sides running out of nodes
+            if forward_key + backward_key >= self._best_distance:
+                break
+
+            # Advance the side with the lowest priority
+            side = 0 if forward_key <= backward_key else 1
+            distances = self._distances[side]
+            other_distances = self._distances[1 - side]
+            previous = self._previous[side]
+            heap = self._heaps[side]
+
+            current_name = heapq.heappop(heap)[1]
+            self._pops += 1
+            self._settled_sides[side].add(current_name)
+            current_distance = distances[current_name]
+
+            # The backward search follows the edges into each node, which matters in a directed graph
+            neighbors = self._iter_neighbors if side == 0 else self._iter_in_neighbors
+            for neighbor, weight in neighbors(nodes[current_name]):
+                distance = current_distance + weight
+                if distance < distances.get(neighbor, math.inf):
+                    distances[neighbor] = distance
+                    previous[neighbor] = current_name
+                    heapq.heappush(heap, (self._key(side, nodes[neighbor], distance), neighbor))
+                    self._pushes += 1
+                # Check whether the edge joins the two searches into a shorter path
+                if neighbor in other_distances and distance + other_distances[neighbor] < self._best_distance:
+                    self._best_distance = distance + other_distances[neighbor]
+                    self._meeting_node = neighbor
+
+    @property
+    def num_settled(self):
+        '''Returns the number of nodes settled by both searches so far'''
+        return len(self._settled_sides[0]) + len(self._settled_sides[1])
+
+    def _collect_stats(self):
+        '''Fills in the counters of the stats from the state of both searches'''
+        stats = self.stats
+        stats.algorithm = type(self).__name__
+        stats.start_node = self.start_node.name
+        stats.end_node = self.end_node.name
+        stats.nodes_settled = self.num_settled
+        nodes = self.graph._nodes
+        # The backward search follows the edges into each node it settles
+        stats.edges_relaxed = (sum(len(nodes[name]._edges) for name in self._settled_sides[0]) +
+                               sum(len(nodes[name]._in_edges) for name in self._settled_sides[1]))
+        # Every node reached on a side gets one push, and later pushes for the same node are decrease-keys
+        stats.queue_pushes = self._pushes
+        stats.decrease_keys = self._pushes - len(self._distances[0]) - len(self._distances[1])
+        stats.stale_pops = self._pops - stats.nodes_settled
+
+    def _path_to_end(self):
+        '''Joins the forward path to the meeting node with the backward path from it'''
+        assert self._meeting_node is not None, "End node is not reachable from the start node"
+        path = []
+        name = self._meeting_node
+        while name is not None:
+            path.append(name)
+            name = self._previous[0][name]
+        path.reverse()
+        name = self._previous[1][self._meeting_node]
+        while name is not None:
+            path.append(name)
+            name = self._previous[1][name]
+        return path
+
+    def _distance_to_end(self):
+        '''Returns the length of the best path found by the two searches'''
+        return self._best_distance
+
+class BidirectionalA_Star(BidirectionalDijkstra):
+    '''Bidirectional search guided by the straight line distance between the nodes' 'pos' data.
+    Both sides use the average of the forward and backward heuristics, which keeps them consistent
+    with each other so the bidirectional stopping rule stays correct.'''
+
+    def _potential(self, side, node):
+        '''Returns half the difference between the distances to the end node and to the start node'''
+        potential = (self._straight_line_distance(node, self.end_node) - self._straight_line_distance(node, self.start_node)) / 2
+        return potential if side == 0 else -potential
+
+    def _straight_line_distance(self, node1, node2):
+        '''Gets the straight line distance between the positions of two nodes'''
+        pos1 = node1.get_data('pos')
+        pos2 = node2.get_data('pos')
+        return math.sqrt((pos1[0]-pos2[0])**2 + (pos1[1]-pos2[1])**2)
+
+class ShortestPathTree():
+    '''Distances and predecessors from a single source node to every reachable node'''
+
+    def __init__(self, source, distances, predecessors):
+        '''Initialize the tree from dictionaries keyed by node name'''
+        self.source = source
+        self._distances = distances
+        self._predecessors = predecessors
+
+    @property
+    def distances(self):
+        '''Returns the shortest distance to every reachable node'''
+        return dict(self._distances)
+
+    @property
+    def predecessors(self):
+        '''Returns the previous node on the shortest path to every reachable node'''
+        return dict(self._predecessors)
+
+    def is_reachable(self, target):
+        '''Checks whether there is a path from the source to the target'''
+        return target in self._distances
+
+    def distance_to(self, target):
+        '''Returns the shortest distance to the target, or infinity if it cannot be reached'''
+        return self._distances.get(target, float('inf'))
+
+    def path_to(self, target):
+        '''Returns the names of the nodes on the shortest path from the source to the target'''
+        assert target in self._distances, "Target node is not reachable from the source"
+        path = [target]
+        # Follow the predecessors back to the source
+        while self._predecessors[path[-1]] is not None:
+            path.append(self._predecessors[path[-1]])
+        path.reverse()
+        return path
+
+
+# Graph shared by the worker processes of distance_matrix
+_worker_graph = None
+
+def _initialize_worker(graph):
+    '''Stores the graph once per worker process instead of once per task'''
+    global _worker_graph
+    _worker_graph = graph
+
+def _distances_from_source(source, targets):
+    '''Returns the distances from one source to every target using the worker's graph'''
+    tree = Dijkstra(_worker_graph, source).shortest_path_tree()
+    return [tree.distance_to(target) for target in targets]
+
+def distance_matrix(graph, sources, targets=None, max_workers=None):
+    '''Returns a matrix of shortest distances with one row per source and one column per target.
+    Each source is searched once, and sources are spread over a process pool unless max_workers is 1.'''
+    sources = list(sources)
+    targets = sources if targets is None else list(targets)
+    graph_nodes = set(graph.nodes)
+    for node in sources + targets:
+        assert node in graph_nodes, "Sources and targets must be nodes in the Graph"
+
+    # Run the searches in this process when only one worker is requested
+    if max_workers == 1:
+        _initialize_worker(graph)
+        return [_distances_from_source(source, targets) for source in sources]
+
+    # The process pool pulls in multiprocessing, so it is only imported when a distance matrix is needed
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker, initargs=(graph,)) as executor:
+        return list(executor.map(_distances_from_source, sources, [targets] * len(sources)))
@@ -0,0 +1,285 @@
+from compact_graph import CompactGraph
+import math
+
+# NumPy is optional and only used to snap whole arrays of coordinates at once
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SpatialIndex():
+    '''Uniform grid over the 'pos' data of the nodes of a graph, for snapping coordinates to the nearest node.
+    Every node with a position is stored in the square cell that contains it, so a query only looks at the
+    cells around its point instead of at every node.
+
+    The index subscribes to a Graph and follows add_node and remove_node. Since a node's 'pos' is usually
+    added after the node itself, new nodes are only read when the next query runs. Call update after
+    moving a node that is already indexed.
+
+    A cell size given to the constructor is kept for good. Without one, the cell size is picked from the
+    nodes' positions and picked again whenever the number of indexed nodes has doubled since, so an index
+    built on an empty or small graph adapts to the scale of the coordinates added later.'''
+
+    def __init__(self, graph, cell_size=None):
+        '''Builds the index. The default cell size puts about one node in each cell of the bounding box.'''
+        self.graph = graph
+        # Position of every indexed node, and the names in every non-empty cell
+        self._positions = {}
+        self._cells = {}
+        # Nodes that were added to the graph but whose position has not been read yet
+        self._pending = set()
+        # Lowest and highest cell numbers ever used, which bound how far a ring search has to go
+        self._bounds = None
+        # NumPy arrays of the nodes for batch snapping, built on first use
+        self._arrays = None
+        positions = {}
+        for name in graph.nodes:
+            pos = self._read_position(name)
+            if pos is not None:
+                positions[name] = pos
+        # The cell size is only picked again as the graph grows if it was not given
+        self._automatic_cell_size = cell_size is None
+        self.cell_size = cell_size if cell_size is not None else _default_cell_size(positions.values())
+        assert self.cell_size > 0, "Cell size must be positive"
+        # Number of nodes the cell size was picked for
+        self._sized_for = len(positions)
+        for name, pos in positions.items():
+            self._insert(name, pos)
+        if hasattr(graph, 'subscribe'):
+            graph.subscribe(self._on_change)
+
+    def close(self):
+        '''Stops following changes to the graph'''
+        if hasattr(self.graph, 'unsubscribe'):
+            self.graph.unsubscribe(self._on_change)
+
+    def __len__(self):
+        '''Returns the number of indexed nodes'''
+        self._flush()
+        return len(self._positions)
+
+    def _read_position(self, name):
+        '''Returns the (x, y) position of a node, or None if it has none'''
+        if isinstance(self.graph, CompactGraph):
+            if not self.graph.has_positions:
+                return None
+            x, y = self.graph.get_position(self.graph.get_node(name))
+            return None if math.isnan(x) else (x, y)
+        node = self.graph.get_node(name)
+        pos = node._data.get('pos') if node._data else None
+        return (pos[0], pos[1]) if pos is not None else None
+
+    def _cell(self, x, y):
+        '''Returns the grid cell that contains a point'''
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _insert(self, name, pos):
+        '''Adds a node at a position'''
+        self._positions[name] = pos
+        self._arrays = None
+        cell = self._cell(*pos)
+        self._cells.setdefault(cell, []).append(name)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            bounds = self._bounds
+            bounds[0] = min(bounds[0], cell[0])
+            bounds[1] = min(bounds[1], cell[1])
+            bounds[2] = max(bounds[2], cell[0])
+            bounds[3] = max(bounds[3], cell[1])
+
+    def _remove(self, name):
+        '''Removes a node from the index if it is in it'''
+        self._pending.discard(name)
+        pos = self._positions.pop(name, None)
+        if pos is None:
+            return
+        self._arrays = None
+        cell = self._cell(*pos)
+        self._cells[cell].remove(name)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def update(self, nodeName):
+        '''Re-reads the position of a node, for example after its 'pos' data changed'''
+        self._remove(nodeName)
+        pos = self._read_position(nodeName)
+        if pos is not None:
+            self._insert(nodeName, pos)
+
+    def _flush(self):
+        '''Indexes the nodes that were added since the last query'''
+        while self._pending:
+            name = self._pending.pop()
+            if name in self.graph:
+                self.update(name)
+        if self._automatic_cell_size and len(self._positions) >= 2 * max(self._sized_for, 1):
+            self._rebuild(_default_cell_size(self._positions.values()))
+
+    def _rebuild(self, cell_size):
+        '''Puts every indexed node back into a grid with a new cell size'''
+        positions = self._positions
+        self.cell_size = cell_size
+        self._sized_for = len(positions)
+        self._positions = {}
+        self._cells = {}
+        self._bounds = None
+        for name, pos in positions.items():
+            self._insert(name, pos)
+
+    def _on_change(self, event, data):
+        '''Keeps the index in step with the nodes of the graph'''
+        if event == 'add_node':
+            self._pending.add(data[0])
+        elif event == 'remove_node':
+            self._remove(data[0])
+
+    def nearest(self, x, y, k=1):
+        '''Returns the k nodes closest to a point as (name, distance) pairs, closest first'''
+        self._flush()
+        if not self._positions:
+            return []
+        k = min(k, len(self._positions))
+        cell_x, cell_y = self._cell(x, y)
+        bounds = self._bounds
+        low_x, low_y, high_x, high_y = bounds
+        # Rings closer than the bounding box of the cells in use are empty, so start at the first one that
+        # touches it, and stop at the ring that reaches its farthest corner
+        ring = max(low_x - cell_x, cell_x - high_x, low_y - cell_y, cell_y - high_y, 0)
+        max_ring = max(cell_x - low_x, high_x - cell_x, cell_y - low_y, high_y - cell_y, 0)
+        found = []
+        while True:
+            # Look at the cells on the square ring at this distance from the point's cell that are in the bounds
+            for cell in _ring(cell_x, cell_y, ring, bounds):
+                for name in self._cells.get(cell, ()):
+                    pos = self._positions[name]
+                    found.append((math.hypot(pos[0] - x, pos[1] - y), name))
+            # Every node outside the rings searched so far is at least this far from the point
+            bound = ring * self.cell_size
+            if len(found) >= k:
+                found.sort(key=lambda item: item[0])
+                if found[k - 1][0] <= bound:
+                    break
+            if ring >= max_ring:
+                found.sort(key=lambda item: item[0])
+                break
+            ring += 1
+        return [(name, distance) for distance, name in found[:k]]
+
+    def within(self, x, y, radius):
+        '''Returns every node within a radius of a point as (name, distance) pairs, closest first'''
+        self._flush()
+        low_x, low_y = self._cell(x - radius, y - radius)
+        high_x, high_y = self._cell(x + radius, y + radius)
+        found = []
+        # Only scan the cells that exist when the radius covers more cells than are filled
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > len(self._cells):
+            cells = [cell for cell in self._cells if low_x <= cell[0] <= high_x and low_y <= cell[1] <= high_y]
+        else:
+            cells = [(i, j) for i in range(low_x, high_x + 1) for j in range(low_y, high_y + 1)]
+        for cell in cells:
+            for name in self._cells.get(cell, ()):
+                pos = self._positions[name]
+                distance = math.hypot(pos[0] - x, pos[1] - y)
+                if distance <= radius:
+                    found.append((distance, name))
+        found.sort(key=lambda item: item[0])
+        return [(name, distance) for distance, name in found]
+
+    def snap(self, x, y):
+        '''Returns the name of the node closest to a point, or None if no node has a position'''
+        nearest = self.nearest(x, y, 1)
+        return nearest[0][0] if nearest else None
+
+    def snap_many(self, coordinates):
+        '''Snaps a sequence of (x, y) points to their closest nodes and returns the list of node names.
+        If NumPy is installed every point is measured against the nodes in the 3 x 3 block of cells around it
+        with array operations over the whole batch, one cell slot at a time.'''
+        self._flush()
+        if np is None or not self._positions:
+            return [self.snap(x, y) for x, y in coordinates]
+        points = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        names, positions, keys, low, high = self._node_arrays()
+        height = high[1] - low[1] + 1
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        best = np.full(len(points), np.inf)
+        best_node = np.zeros(len(points), dtype=np.int64)
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                cell_x = cells[:, 0] + i - low[0]
+                cell_y = cells[:, 1] + j - low[1]
+                inside = (cell_x >= 0) & (cell_x <= high[0] - low[0]) & (cell_y >= 0) & (cell_y < height)
+                key = cell_x * height + cell_y
+                # The nodes of each point's cell are a range of the nodes sorted by cell
+                first = np.searchsorted(keys, key, side='left')
+                count = np.where(inside, np.searchsorted(keys, key, side='right') - first, 0)
+                for slot in range(int(count.max()) if len(points) else 0):
+                    rows = np.flatnonzero(count > slot)
+                    nodes = first[rows] + slot
+                    offsets = positions[nodes] - points[rows]
+                    squared = np.einsum('ij,ij->i', offsets, offsets)
+                    closer = squared < best[rows]
+                    best[rows[closer]] = squared[closer]
+                    best_node[rows[closer]] = nodes[closer]
+
+        result = []
+        for index, (squared, node) in enumerate(zip(best.tolist(), best_node.tolist())):
+            # Any node outside the 3 x 3 block of cells is at least one cell size away from the point,
+            # so a closer candidate is the answer. Otherwise fall back to the ring search.
+            if squared <= self.cell_size ** 2:
+                result.append(names[node])
+            else:
+                result.append(self.snap(*points[index].tolist()))
+        return result
+
+    def _node_arrays(self):
+        '''Returns the names, positions and cell keys of the nodes sorted by cell, with the lowest and highest cells.
+        The arrays are kept until the next node is added or removed.'''
+        if self._arrays is None:
+            names = list(self._positions)
+            positions = np.array([self._positions[name] for name in names], dtype=float)
+            cells = np.floor(positions / self.cell_size).astype(np.int64)
+            low = cells.min(axis=0)
+            high = cells.max(axis=0)
+            keys = (cells[:, 0] - low[0]) * (high[1] - low[1] + 1) + (cells[:, 1] - low[1])
+            order = np.argsort(keys, kind='stable')
+            self._arrays = ([names[i] for i in order.tolist()], positions[order], keys[order], low, high)
+        return self._arrays
+
+
+def _ring(cell_x, cell_y, ring, bounds):
+    '''Yields the cells on the square ring at a distance from a cell that are inside the (low x, low y,
+    high x, high y) bounds'''
+    low_x, low_y, high_x, high_y = bounds
+    if ring == 0:
+        yield (cell_x, cell_y)
+        return
+    # The top and bottom rows of the ring, clipped to the bounds
+    first_x = max(cell_x - ring, low_x)
+    last_x = min(cell_x + ring, high_x)
+    for j in (cell_y - ring, cell_y + ring):
+        if low_y <= j <= high_y:
+            for i in range(first_x, last_x + 1):
+                yield (i, j)
+    # The left and right columns between those rows, clipped to the bounds
+    first_y = max(cell_y - ring + 1, low_y)
+    last_y = min(cell_y + ring - 1, high_y)
+    for i in (cell_x - ring, cell_x + ring):
+        if low_x <= i <= high_x:
+            for j in range(first_y, last_y + 1):
+                yield (i, j)
+
+
+def _default_cell_size(positions):
+    '''Picks a cell size that puts about one position in each cell of their bounding box'''
+    positions = list(positions)
+    if len(positions) < 2:
+        return 1.0
+    xs = [pos[0] for pos in positions]
+    ys = [pos[1] for pos in positions]
+    area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+    if area <= 0:
+        # The points are on a line, so spread them along its length instead
+        return max(max(xs) - min(xs), max(ys) - min(ys), 1.0) / len(positions)
+    return math.sqrt(area / len(positions))
@@ -0,0 +1,49 @@
+from array import array
+from operator import itemgetter
+
+
+def cost_function(criteria, weight):
+    '''Turns a weight selection into a function from an edge's stored weight to the cost a search uses.
+    criteria is the tuple of cost names of a multi-criteria graph, or None if every edge has a single weight.
+    weight can be None for the default cost, the name or position of a criterion, a {criterion: factor}
+    dictionary for a weighted sum of criteria, or any function of the edge's weight or cost vector.
+    Returns None when the stored weight can be used as it is.'''
+    if weight is None:
+        # A multi-criteria graph uses its first criterion by default
+        return itemgetter(0) if criteria else None
+    if callable(weight):
+        return weight
+    assert criteria, "Cost profiles need a graph with criteria"
+    if isinstance(weight, dict):
+        terms = [(criteria.index(name), factor) for name, factor in weight.items()]
+        return lambda costs: sum(factor * costs[i] for i, factor in terms)
+    if isinstance(weight, str):
+        assert weight in criteria, "Criterion does not exist in graph"
+        return itemgetter(criteria.index(weight))
+    assert 0 <= weight < len(criteria), "Criterion does not exist in graph"
+    return itemgetter(weight)
+
+
+def cost_array(criteria, columns, weight):
+    '''Evaluates a weight selection over every edge at once and returns the costs as an array.
+    columns holds one array per criterion, or a single array of weights if the graph has no criteria.
+    Named criteria are returned as they are and weighted sums are built a column at a time, so the
+    selection is only turned into numbers once instead of once per relaxed edge.'''
+    if weight is None:
+        return columns[0]
+    if callable(weight):
+        if criteria:
+            return array('d', map(weight, zip(*columns)))
+        return array('d', map(weight, columns[0]))
+    assert criteria, "Cost profiles need a graph with criteria"
+    if isinstance(weight, dict):
+        costs = array('d', bytes(8 * len(columns[0])))
+        for name, factor in weight.items():
+            column = columns[criteria.index(name)]
+            costs = array('d', [cost + factor * value for cost, value in zip(costs, column)])
+        return costs
+    if isinstance(weight, str):
+        assert weight in criteria, "Criterion does not exist in graph"
+        return columns[criteria.index(weight)]
+    assert 0 <= weight < len(criteria), "Criterion does not exist in graph"
+    return columns[weight]